@@ -0,0 +1,69 @@
+import random
+from typing import List, Sequence
+
+
+class AliasTable:
+    """
+    Draw an index with given weights in constant time, using the alias method of Walker, built as described by Vose
+    """
+    __slots__ = ("probabilities", "aliases")
+
+    def __init__(self, weights: Sequence[float]):
+        """
+        :param weights: the positive weights of each index, they do not need to sum to 1
+        """
+        total = sum(weights)
+        if not weights or total <= 0:
+            raise ValueError("An alias table needs at least one positive weight")
+        size = len(weights)
+        scaled = [weight * size / total for weight in weights]  # the mean of the scaled weights is 1
+        probabilities = [1.] * size
+        aliases = list(range(size))
+        small = [i for i, weight in enumerate(scaled) if weight < 1]
+        large = [i for i, weight in enumerate(scaled) if weight >= 1]
+        while small and large:  # each column is filled by a small weight and topped up by a large one
+            less, more = small.pop(), large.pop()
+            probabilities[less] = scaled[less]
+            aliases[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+        # what remains is 1 up to rounding errors, their columns keep a probability of 1
+        self.probabilities = tuple(probabilities)
+        self.aliases = tuple(aliases)
+
+    @classmethod
+    def restore(cls, probabilities: Sequence[float], aliases: Sequence[int]) -> "AliasTable":
+        """
+        rebuild a table from the columns of another one, without building it again
+        :param probabilities: the probability of each column to keep its own index
+        :param aliases: the index given by each column otherwise
+        :return: the table
+        """
+        table = cls.__new__(cls)
+        table.probabilities = probabilities
+        table.aliases = aliases
+        return table
+
+    def __len__(self):
+        return len(self.probabilities)
+
+    def draw(self, rng: random.Random = random) -> int:
+        """
+        :param rng: the random generator to draw with, the global one of the random module by default
+        :return: an index drawn with the weights of the table
+        """
+        column = rng.randrange(len(self.probabilities))
+        return column if rng.random() < self.probabilities[column] else self.aliases[column]
+
+    def draw_many(self, count: int, rng: random.Random = random) -> List[int]:
+        """
+        :param count: the number of indexes to draw
+        :param rng: the random generator to draw with, the global one of the random module by default
+        :return: indexes drawn with the weights of the table
+        """
+        probabilities, aliases = self.probabilities, self.aliases
+        columns = rng.choices(range(len(probabilities)), k=count)
+        return [
+            column if toss < probabilities[column] else aliases[column]
+            for column, toss in zip(columns, [rng.random() for _ in range(count)])
+        ]
@@ -0,0 +1,102 @@
+"""
+Measure how a process pool generating NPCs scales with the number of workers, and how much memory each worker keeps
+for itself when the content grows, with the config files parsed by every worker or the content pack mapped by all:
+a worker of the pack stays about the same size at any scale, the pack being shared.
+Run from the root of the repository: python -m benchmarks.process_scaling
+"""
+from concurrent.futures import ProcessPoolExecutor
+from configparser import ConfigParser
+import os
+import resource
+import tempfile
+import time
+from typing import Callable, Tuple
+
+from benchmarks.trait_scaling import scaled_config
+from content_pack import compile_pack
+from workers import generate_many, make_executor
+
+SCALES = (1, 4, 16, 64)
+WORKERS = tuple(sorted({1, 2, 4, os.cpu_count() or 1}))
+CROWD = 20000  # NPCs generated for each measure
+
+
+def private_memory() -> int:
+    """
+    :return: the number of bytes of anonymous memory of the current process that are not shared with another one, the
+    memory it allocated for itself. The pages of a mapped content pack are left out: they are the page cache of the
+    file, shared by every process mapping it. Its peak resident size where /proc is not available
+    """
+    try:
+        total = 0
+        fields = dict()
+        with open("/proc/self/smaps") as file:
+            for line in file:
+                key, _, value = line.partition(":")
+                if key in ("Private_Clean", "Private_Dirty", "Anonymous"):
+                    fields[key] = int(value.split()[0])
+                    if len(fields) == 3:
+                        total += min(fields["Anonymous"], fields["Private_Clean"] + fields["Private_Dirty"])
+                        fields.clear()
+        return total * 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def worker_memory(executor, workers: int) -> float:
+    """
+    :return: the mean private memory of the workers of a pool, in MiB
+    """
+    sizes = [future.result() for future in [executor.submit(private_memory) for _ in range(4 * workers)]]
+    return sum(sizes) / len(sizes) / 2 ** 20
+
+
+def write_content(npc_path: str, pack_path: str, scale: int):
+    """
+    write npc.ini repeated scale times and compile it into a pack
+    """
+    source = ConfigParser()
+    source.read("npc.ini", "utf8")
+    with open(npc_path, "w", encoding="utf8") as file:
+        scaled_config(source, scale).write(file)
+    compile_pack(pack_path, npc_path)
+
+
+def measure_pool(npc_path: str, pack_path: str, workers: int) -> Tuple[float, float]:
+    """
+    :return: the number of NPCs generated per second by a process pool, and the mean private memory of its workers in
+    MiB
+    """
+    executor = make_executor("process", workers, npc_path, pack_path=pack_path)
+    generate_many(executor, workers, "sw")  # start every worker
+    start = time.perf_counter()
+    generate_many(executor, CROWD, "sw")
+    speed = CROWD / (time.perf_counter() - start)
+    memory = worker_memory(executor, workers)
+    executor.shutdown()
+    return speed, memory
+
+
+def run_apart(func: Callable, *args):
+    """
+    call a function in a new process: the workers forked by it do not inherit what this process allocated before
+    """
+    with ProcessPoolExecutor(1) as executor:
+        return executor.submit(func, *args).result()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in SCALES:
+            npc_path = os.path.join(directory, f"npc_x{scale}.ini")
+            pack_path = os.path.join(directory, f"npc_x{scale}.pack")
+            run_apart(write_content, npc_path, pack_path, scale)
+            for pack in (None, pack_path):
+                for workers in WORKERS:
+                    speed, memory = run_apart(measure_pool, npc_path, pack, workers)
+                    print(f"x{scale:<3} {'pack' if pack else 'ini ':<4} {workers:>2} workers: "
+                          f"{speed:>9.0f} NPC/s, {memory:>6.1f} MiB private per worker")
+
+
+if __name__ == '__main__':
+    main()
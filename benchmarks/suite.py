@@ -0,0 +1,187 @@
+"""
+Measure the generator on the shipped content and on synthetic content of growing size: micro-benchmarks of single
+calls and macro-benchmarks of whole crowds, with their throughput, their latency percentiles and their peak memory.
+The results are saved as JSON so that two runs can be compared.
+Run from the root of the repository: python -m manager bench [--output results.json] [--compare previous.json]
+"""
+from configparser import ConfigParser
+import json
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence
+
+from benchmarks.synthetic import write_synthetic
+from manager import NPCGenerator, create_name
+
+SIZES = (750, 5000, 50000)  # the number of traits of the synthetic contents
+CROWD = 10000  # NPCs of the macro-benchmarks
+DURATION = 1.0  # seconds spent on each benchmark
+MIN_RUNS = 3  # calls of each benchmark, even if they take longer than the duration
+
+
+def measure(func: Callable, duration: float = DURATION, ops: int = 1) -> dict:
+    """
+    call a function again and again, timing each call
+    :param func: the function to measure
+    :param duration: the number of seconds to spend calling it
+    :param ops: the number of operations done by each call, i.e. the size of a crowd
+    :return: the operations per second and the 50th and 99th percentiles of the latency of a call, in microseconds
+    """
+    latencies = list()
+    start = time.perf_counter_ns()
+    end = start + int(duration * 1e9)
+    while len(latencies) < MIN_RUNS or time.perf_counter_ns() < end:
+        before = time.perf_counter_ns()
+        func()
+        latencies.append(time.perf_counter_ns() - before)
+    elapsed = time.perf_counter_ns() - start
+    latencies.sort()
+    return {
+        "calls": len(latencies), "ops_per_s": len(latencies) * ops / elapsed * 1e9,
+        "p50_us": percentile(latencies, 50) / 1e3, "p99_us": percentile(latencies, 99) / 1e3
+    }
+
+
+def percentile(values: Sequence[float], rank: float) -> float:
+    """
+    :param values: the sorted values
+    :param rank: the percentile, between 0 and 100
+    :return: the value below which rank percent of the values are, by the nearest rank method
+    """
+    return values[min(len(values) - 1, max(0, round(rank / 100 * len(values)) - 1))]
+
+
+def peak_memory(func: Callable) -> float:
+    """
+    :param func: the function to measure, it is called once more with the allocations traced
+    :return: the peak of the memory allocated during the call, in KiB
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def benchmarks(generator: NPCGenerator, config: ConfigParser, stats_path: str) -> Dict[str, tuple]:
+    """
+    :param generator: a generator of the content to measure
+    :param config: the traits of the generator
+    :param stats_path: the stats of the generator
+    :return: each benchmark by name, as the function to call and the number of operations it does
+    """
+    # the species and jobs of star wars NPCs, so that they have stats, in their masculine form as in the stats file
+    masculinize = generator.renderer.genders.masculinize
+    rows = [
+        ("sw", masculinize(npc["specie"], "SPECIES"), generator.job_key(npc["job"]))
+        for npc in generator.generate_many(CROWD, "sw")
+    ]
+    _, specie, job_key = rows[0]
+    return {
+        # micro: a single call, as done by the GUI and the bot
+        "generate": (generator.generate, 1),
+        "generate sw title w": (lambda: generator.generate("sw", "title", "w"), 1),
+        "select_trait": (lambda: generator.select_trait("JOBS", {"sw", "w"}), 1),
+        "get_characteristics": (lambda: generator.get_characteristics("sw", specie, job_key), 1),
+        "create_name": (lambda: create_name(random.randint(1, 3)), 1),
+        "describe": (lambda: generator.renderer.describe(generator.generate()), 1),
+        # macro: whole crowds and the compilation of the content
+        f"generate_many {CROWD}": (lambda: generator.generate_many(CROWD), CROWD),
+        f"generate_roster {CROWD}": (lambda: generator.generate_roster(CROWD), CROWD),
+        f"describe roster {CROWD}": (lambda: [npc.describe() for npc in generator.generate_roster(CROWD)], CROWD),
+        f"get_characteristics_many {CROWD}": (lambda: generator.get_characteristics_many(rows), CROWD),
+        "load": (lambda: NPCGenerator(config, stats_path=stats_path).stats_table.table(), 1),
+    }
+
+
+def run_content(content: str, npc_path: str, stats_path: str, duration: float, selected: Sequence[str]) -> List[dict]:
+    """
+    run every benchmark on a content
+    :param content: the name of the content, for the results
+    :param npc_path: the path to the trait file
+    :param stats_path: the path to the stats file
+    :param duration: the number of seconds spent on each benchmark
+    :param selected: the benchmarks to run, every one if empty
+    :return: the results of each benchmark
+    """
+    config = ConfigParser()
+    config.read(npc_path, "utf8")
+    generator = NPCGenerator(config, stats_path=stats_path)
+    nb_traits = sum(len(section) for section in generator.index.sections.values())
+    results = list()
+    for name, (func, ops) in benchmarks(generator, config, stats_path).items():
+        if selected and name.split()[0] not in selected:
+            continue
+        result = {"content": content, "traits": nb_traits, "benchmark": name}
+        result.update(measure(func, duration, ops))
+        result["peak_kib"] = peak_memory(func)
+        print(f"{content:<16} {name:<32} {result['ops_per_s']:>12.0f} ops/s  p50 {result['p50_us']:>10.1f} µs  "
+              f"p99 {result['p99_us']:>10.1f} µs  peak {result['peak_kib']:>10.1f} KiB")
+        results.append(result)
+    return results
+
+
+def compare(results: List[dict], previous_path: str):
+    """
+    print the throughput of each benchmark against a previous run
+    :param results: the results of this run
+    :param previous_path: the JSON file of the previous run
+    """
+    with open(previous_path, encoding="utf8") as file:
+        previous = {(row["content"], row["benchmark"]): row for row in json.load(file)["results"]}
+    print(f"\nCompared to {previous_path}:")
+    for row in results:
+        old = previous.get((row["content"], row["benchmark"]))
+        if old is not None and old["ops_per_s"]:
+            print(f"{row['content']:<16} {row['benchmark']:<32} x{row['ops_per_s'] / old['ops_per_s']:.2f} ops/s, "
+                  f"x{row['peak_kib'] / old['peak_kib'] if old['peak_kib'] else 0:.2f} peak memory")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes: Sequence[int] = SIZES, vocabulary: int = 32, density: float = 0.1, duration: float = DURATION,
+        selected: Sequence[str] = (), output: Optional[str] = None, previous: Optional[str] = None,
+        seed: int = 0) -> dict:
+    """
+    run the benchmarks on npc.ini and on synthetic contents
+    :param sizes: the number of traits of each synthetic content
+    :param vocabulary: the number of free tags of the synthetic contents
+    :param density: the probability of each synthetic trait to carry each free tag
+    :param duration: the number of seconds spent on each benchmark
+    :param selected: the benchmarks to run by their first word, i.e. generate_many, every one if empty
+    :param output: the JSON file to save the results to, not saved if None
+    :param previous: the JSON file of a previous run to compare with, if not None
+    :param seed: the seed of the synthetic contents and of the draws
+    :return: the report, as saved
+    """
+    random.seed(seed)
+    results = run_content("npc.ini", "npc.ini", "stats.ini", duration, selected)
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            npc_path, stats_path = write_synthetic(directory, seed, traits=size, vocabulary=vocabulary,
+                                                   density=density)
+            results += run_content(f"synthetic {size}", npc_path, stats_path, duration, selected)
+    report = {
+        "commit": git_commit(), "date": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"sizes": list(sizes), "vocabulary": vocabulary, "density": density, "duration": duration,
+                     "crowd": CROWD, "seed": seed},
+        "results": results
+    }
+    if output is not None:
+        with open(output, "w", encoding="utf8") as file:
+            json.dump(report, file, indent=2)
+    if previous is not None:
+        compare(results, previous)
+    return report
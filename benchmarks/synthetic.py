@@ -0,0 +1,112 @@
+"""
+Generate synthetic trait and stats files of any size, to measure the generator on content shaped like npc.ini without
+writing it by hand.
+Run from the root of the repository: python -m benchmarks.synthetic directory [--traits N] [--vocabulary N] ...
+"""
+from argparse import ArgumentParser
+from configparser import ConfigParser
+import os
+import random
+from typing import Tuple
+
+from constant_strings import *
+
+# the number of traits of each section of npc.ini, the synthetic sections keep these proportions
+SECTION_SIZES = {
+    "TITLES": 17, "JOBS": 157, "SPECIES": 38, "APPEARANCES": 20, "BEHAVIOR": 21, "PERSONALITY": 408,
+    "ACCESSORIES": 86
+}
+GENDERED_SECTIONS = {"JOBS", "SPECIES", "APPEARANCES", "PERSONALITY"}
+DETERMINERS = (MASC, FEM, PLUR, PLURS)
+BEHAVIOR_KINDS = (ADJ, POSS, VERB)
+
+
+def synthetic_config(traits: int = 750, vocabulary: int = 32, density: float = 0.1, extra_sections: int = 0,
+                     seed: int = 0) -> ConfigParser:
+    """
+    build a config file shaped like npc.ini: the same sections with the same proportions, the game and gender tags,
+    and the grammar tags each section needs
+    :param traits: the number of traits of the generated sections, spread like in npc.ini
+    :param vocabulary: the number of free tags shared by all the sections, on top of the game and grammar ones
+    :param density: the probability of each trait to carry each free tag
+    :param extra_sections: the number of sections added beside the ones the generator draws from, they are compiled
+    but never drawn from
+    :param seed: the seed of the random draws, the same arguments always give the same file
+    :return: the config
+    """
+    rand = random.Random(seed)
+    free_tags = [f"tag{i}" for i in range(vocabulary)]
+    total = sum(SECTION_SIZES.values())
+    sizes = {sec: max(1, round(traits * size / total)) for sec, size in SECTION_SIZES.items()}
+    sizes.update({f"EXTRA{i}": max(1, traits // len(SECTION_SIZES)) for i in range(extra_sections)})
+    config = ConfigParser()
+    for sec, size in sizes.items():
+        items = dict()
+        for i in range(size):
+            tags = [game for game in (SW_TAG, OGL_TAG) if rand.random() < 0.7] or [rand.choice((SW_TAG, OGL_TAG))]
+            tags += [MAN, WOM] if rand.random() < 0.8 else [rand.choice((MAN, WOM))]
+            if sec in GENDERED_SECTIONS and rand.random() < 0.5:
+                tags.append(GENDERED)
+            if sec == "ACCESSORIES":
+                tags.append(rand.choice(DETERMINERS))
+            elif sec == "BEHAVIOR":
+                kind = rand.choice(BEHAVIOR_KINDS)
+                tags += [kind, rand.choice((MASC, FEM))] if kind == POSS else [kind]
+            tags += [tag for tag in free_tags if rand.random() < density]
+            items[f"{sec.lower()} {i}"] = ", ".join(tags)
+        config[sec] = items
+    return config
+
+
+def synthetic_stats(config: ConfigParser, seed: int = 0) -> ConfigParser:
+    """
+    build a stats file giving stats to every specie and job of a config, like stats.ini
+    :param config: the traits, see synthetic_config
+    :param seed: the seed of the random draws
+    :return: the stats config
+    """
+    rand = random.Random(seed)
+    stats = ConfigParser()
+    for game, (low, high) in (("SW", (1, 3)), ("FANTASY", (8, 12))):
+        rows = {specie: (low, high) for specie in config["SPECIES"]}
+        rows.update({job: (0, 1) for job in config["JOBS"]})
+        stats[game] = {
+            key: ", ".join(str(rand.randint(*bounds)) for _ in range(6)) for key, bounds in rows.items()
+        }
+    return stats
+
+
+def write_synthetic(directory: str, seed: int = 0, **kwargs) -> Tuple[str, str]:
+    """
+    write a synthetic trait file and its stats file
+    :param directory: the directory of the files
+    :param seed: the seed of the random draws
+    :param kwargs: the arguments of synthetic_config
+    :return: the paths to the trait file and to the stats file
+    """
+    config = synthetic_config(seed=seed, **kwargs)
+    npc_path = os.path.join(directory, "npc.ini")
+    stats_path = os.path.join(directory, "stats.ini")
+    with open(npc_path, "w", encoding="utf8") as file:
+        config.write(file)
+    with open(stats_path, "w", encoding="utf8") as file:
+        synthetic_stats(config, seed).write(file)
+    return npc_path, stats_path
+
+
+def main():
+    parser = ArgumentParser(description="Write a synthetic npc.ini and stats.ini")
+    parser.add_argument("directory")
+    parser.add_argument("--traits", type=int, default=750)
+    parser.add_argument("--vocabulary", type=int, default=32)
+    parser.add_argument("--density", type=float, default=0.1)
+    parser.add_argument("--extra-sections", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    os.makedirs(args.directory, exist_ok=True)
+    print(*write_synthetic(args.directory, args.seed, traits=args.traits, vocabulary=args.vocabulary,
+                           density=args.density, extra_sections=args.extra_sections), sep="\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Measure how many NPCs per second the generator produces as the trait files grow.
+Run from the root of the repository: python -m benchmarks.trait_scaling
+"""
+from configparser import ConfigParser
+import time
+
+from manager import NPCGenerator
+
+SCALES = (1, 2, 4, 8, 16, 32)
+DURATION = 1.0  # seconds spent generating for each scale
+
+
+def scaled_config(source: ConfigParser, scale: int) -> ConfigParser:
+    """
+    duplicate every trait of the config file to make it bigger
+    :param source: the original config
+    :param scale: how many copies of each trait to keep
+    :return: a config with scale times more traits in every section
+    """
+    config = ConfigParser()
+    for sec in source.sections():
+        config[sec] = {
+            (trait if copy == 0 else f"{trait} {copy}"): tags
+            for copy in range(scale) for trait, tags in source[sec].items()
+        }
+    return config
+
+
+def generations_per_second(generator: NPCGenerator, *tags) -> float:
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        generator.generate(*tags)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    source = ConfigParser()
+    source.read("npc.ini", "utf8")
+    for scale in SCALES:
+        config = scaled_config(source, scale)
+        generator = NPCGenerator(config)
+        nb_traits = sum(len(config[sec]) for sec in config.sections())
+        print(f"x{scale:<3} {nb_traits:>6} traits: "
+              f"{generations_per_second(generator):>9.0f} NPC/s (no tags), "
+              f"{generations_per_second(generator, 'sw', 'title', 'w'):>9.0f} NPC/s (sw, title, w)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,66 +1,77 @@
+import asyncio
 import os
-from configparser import ConfigParser
 
 import typing
 from discord.ext import commands
 from dotenv import load_dotenv
 
-from manager import NPCGenerator, create_name
-from constant_strings import *
+from instrumentation import format_stats
+from manager import create_name
+from workers import GenerationPool, NPCBuffer, PoolBusy, make_executor, perf_report, profile_npc, tag_list
 
 load_dotenv()
 TOKEN = os.getenv('DISCORD_TOKEN')
 GUILD = os.getenv('DISCORD_GUILD')
+MESSAGE_LIMIT = 2000  # the number of characters of a Discord message
 
 bot = commands.Bot(command_prefix='!')
 
-npc = ConfigParser()
-npc.read("npc.ini", "utf8")
-npc_generator = NPCGenerator(npc)
+pool = GenerationPool(
+    make_executor(os.getenv('NPC_POOL', "thread"), int(os.getenv('NPC_WORKERS', 2)), pack_path=os.getenv('NPC_PACK'),
+                  instrument=bool(os.getenv('NPC_INSTRUMENT'))),
+    max_pending=int(os.getenv('NPC_MAX_PENDING', 32)),
+    timeout=float(os.getenv('NPC_TIMEOUT', 5))
+)
+npc_buffer = NPCBuffer(pool, size=int(os.getenv('NPC_BUFFER_SIZE', 64)))
 
 
 @bot.event
 async def on_ready():
     print(f'{bot.user.name} has connected to Discord!')
+    npc_buffer.start()
 
 
 @bot.command(name="generate", help="Generate a npc.", aliases=["g"])
 async def generate(ctx, *tag: typing.Optional[str]):
-    traits = npc_generator.generate(*tag)
-    if traits['gender'] == WOM:
-        e_gender = 'e'
-    else:
-        e_gender = ""
-    if FEM in npc_generator.tags[traits['accessories'].upper()]:
-        det_accessories = "une"
-    elif MASC in npc_generator.tags[traits['accessories'].upper()]:
-        det_accessories = "un"
-    elif PLUR in npc_generator.tags[traits['accessories'].upper()]:
-        det_accessories = "de"
-    elif PLURS in npc_generator.tags[traits['accessories'].upper()]:
-        det_accessories = "des"
-    else:
-        det_accessories = ""
-    npc_description = f"{traits['name']} est un{e_gender} {traits['job']} {traits['specie']} plutôt " \
-                      f"{traits['appearance']}, {traits['behavior']}, semble être {traits['personality']} et " \
-                      f"a {det_accessories} {traits['accessories']}"
-    await ctx.send(npc_description)
+    await npc_buffer.reply(ctx, *tag)
 
 
 @bot.command(name="name", help="Generate a name.", aliases=["n"])
 async def get_name(ctx, length: typing.Optional[int]):
     if length is None:
         length = 2
-    name = create_name(length)
-    await ctx.send(name)
+    await pool.reply(ctx, create_name, length)
 
 
 @bot.command(name="tags", help="get the tags of the generator")
 async def get_tags(ctx):
-    tags = ""
-    for tag in npc_generator.get_tag_list():
-        tags += tag + " "
-    await ctx.send(tags)
+    await pool.reply(ctx, tag_list)
+
+
+@bot.command(name="perf", help="Show the performance counters, or profile a generation: !perf profile|memory [tags]")
+async def perf(ctx, *args: typing.Optional[str]):
+    if args and args[0] in ("profile", "memory"):
+        try:
+            report = await pool.run(profile_npc, args[0] == "profile", args[0] == "memory", *args[1:])
+        except (PoolBusy, asyncio.TimeoutError):
+            report = "The workers are too busy to profile a generation, try again in a moment."
+    else:
+        try:
+            report = await pool.run(perf_report)
+        except (PoolBusy, asyncio.TimeoutError):
+            report = "The workers are too busy to report their counters."
+        report += "\nbuffer:\n" + format_stats(npc_buffer.stats(), "  ")
+    await ctx.send(code_block(report))
+
+
+def code_block(text: str) -> str:
+    """
+    :param text: the text to send
+    :return: the text in a code block, cut to fit in a message
+    """
+    text = text[:MESSAGE_LIMIT - 8]
+    return f"```\n{text}\n```"
 
 
 bot.run(TOKEN)
+pool.shutdown()
@@ -12,8 +12,20 @@ OGL = "OGL"
 SW_TAG = "sw"
 OGL_TAG = "fantasy"
 GAMES = {STAR_WARS: SW_TAG, OGL: OGL_TAG}
+JOB_DEFAULT_STATS = {SW_TAG: (0, 0, 0, 0, 0, 0), OGL_TAG: (10, 10, 10, 10, 10, 10)}
 TITLE = "title"
 ADJ = "adj"
 POSS = "poss"
 VERB = "verb"
 BEHAVE = "behave"
+WEIGHT_PREFIX = "weight="
+FEMININE_SECTION = "FEMININE"
+METADATA_SECTIONS = {FEMININE_SECTION}  # sections of the config file that do not hold traits
+FALLBACK_RELAX = "relax"
+FALLBACK_RAISE = "raise"
+FALLBACK_NONE = "none"
+FALLBACKS = {FALLBACK_RELAX, FALLBACK_RAISE, FALLBACK_NONE}
+NPC_SECTIONS = {
+    "job": "JOBS", "specie": "SPECIES", "appearance": "APPEARANCES", "behavior": "BEHAVIOR",
+    "personality": "PERSONALITY", "accessories": "ACCESSORIES"
+}
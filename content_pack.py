@@ -0,0 +1,541 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from configparser import ConfigParser
+from functools import lru_cache
+from typing import Dict, Mapping, Sequence, Tuple
+
+from alias import AliasTable
+from manager import GenderTable, Renderer, SectionForms, StatsTable
+from trait_index import SectionIndex, TraitIndex
+
+PACK_MAGIC = b"NPCPACK\0"
+PACK_VERSION = 5
+BYTE_ORDER = 0x01020304  # read back in another order on a machine of the other endianness
+# magic, version, byte order, hashes of npc.ini and stats.ini, offsets of the 5 blocks
+HEADER = struct.Struct("<8sII32s32sIIIII")
+PAIR = struct.Struct("<II")
+SECTION = struct.Struct("<IIIIII")  # name, traits, vocabulary, tag sets, tag references, weighted
+
+
+class PackError(ValueError):
+    """
+    Raised when a file is not a content pack this version can read
+    """
+
+
+def source_hashes(npc_path: str = "npc.ini", stats_path: str = "stats.ini") -> Tuple[bytes, bytes]:
+    """
+    :return: the sha256 of each content file, a missing file is hashed as an empty one
+    """
+    hashes = list()
+    for path in (npc_path, stats_path):
+        try:
+            with open(path, "rb") as file:
+                hashes.append(hashlib.sha256(file.read()).digest())
+        except OSError:
+            hashes.append(hashlib.sha256(b"").digest())
+    return hashes[0], hashes[1]
+
+
+class _Writer:
+    """
+    Build the blocks of a pack, every array starts on 8 bytes so that it can be viewed in place
+    """
+
+    def __init__(self):
+        self.strings = dict()
+        self.buffer = bytearray()
+
+    def string(self, string: str) -> int:
+        return self.strings.setdefault(string, len(self.strings))
+
+    def pack(self, layout: struct.Struct, *values):
+        self.buffer += layout.pack(*values)
+
+    def array(self, typecode: str, values):
+        self.buffer += array(typecode, values).tobytes()
+        self.align()
+
+    def align(self):
+        self.buffer += bytes(-len(self.buffer) % 8)
+
+    def sorted_map(self, mapping: Mapping[str, str]):
+        """
+        write a mapping of strings, its keys sorted so that it is read back as a _SortedMap
+        """
+        keys = sorted(mapping)
+        self.pack(PAIR, len(keys), 0)
+        self.array("I", map(self.string, keys))
+        self.array("I", (self.string(mapping[key]) for key in keys))
+
+
+class _Reader:
+    """
+    Read the blocks of a pack in place, the arrays are views of the mapped file
+    """
+
+    def __init__(self, view: memoryview, offset: int):
+        self.view = view
+        self.offset = offset
+
+    def unpack(self, layout: struct.Struct) -> tuple:
+        values = layout.unpack_from(self.view, self.offset)
+        self.offset += layout.size
+        return values
+
+    def array(self, typecode: str, count: int) -> memoryview:
+        size = count * array(typecode).itemsize
+        values = self.view[self.offset:self.offset + size].cast(typecode)
+        self.offset += size + (-size % 8)
+        return values
+
+    def raw(self, size: int) -> memoryview:
+        values = self.view[self.offset:self.offset + size]
+        self.offset += size + (-size % 8)
+        return values
+
+
+class _StringTable(Sequence):
+    """
+    Every string of a pack by id, decoded from the mapping when it is read. Only the most recently used ones are kept,
+    so a process holds a bounded number of strings however large the pack is
+    """
+    __slots__ = ("offsets", "blob", "decode")
+
+    def __init__(self, offsets: memoryview, blob: memoryview, cache_size: int):
+        self.offsets = offsets
+        self.blob = blob
+        self.decode = lru_cache(maxsize=cache_size)(self._decode)
+
+    def _decode(self, i: int) -> str:
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.decode(i)
+
+
+class _Strings(Sequence):
+    """
+    A sequence of strings of a pack, given by their ids, which are decoded by the function of the string table
+    """
+    __slots__ = ("decode", "ids")
+
+    def __init__(self, table: _StringTable, ids: Sequence[int]):
+        self.decode = table.decode
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i: int) -> str:
+        return self.decode(self.ids[i])
+
+
+class _Slices(Sequence):
+    """
+    A sequence of arrays of a pack, the n-th one is the values between the n-th and the n+1-th offsets
+    """
+    __slots__ = ("offsets", "values")
+
+    def __init__(self, offsets: memoryview, values):
+        self.offsets = offsets
+        self.values = values
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int):
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+
+class _SortedMap(Mapping):
+    """
+    A read-only mapping of a pack, its keys are sorted so that a key is found by bisection without any dict
+    """
+    __slots__ = ("sorted_keys", "sorted_values")
+
+    def __init__(self, keys: Sequence[str], values: Sequence):
+        """
+        :param keys: the keys, sorted
+        :param values: the value of each key, aligned with them
+        """
+        self.sorted_keys = keys
+        self.sorted_values = values
+
+    def __getitem__(self, key: str):
+        if isinstance(key, str):
+            i = bisect_left(self.sorted_keys, key)
+            if i < len(self.sorted_keys) and self.sorted_keys[i] == key:
+                return self.sorted_values[i]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.sorted_keys)
+
+    def __len__(self):
+        return len(self.sorted_keys)
+
+
+class _TagMap(Mapping):
+    """
+    A read-only mapping of a pack giving a value for each tag of a section, decoded on access
+    """
+    __slots__ = ("vocabulary", "by_number")
+
+    def __init__(self, vocabulary: Mapping[str, int], by_number: Sequence):
+        """
+        :param vocabulary: the number of each tag of the section
+        :param by_number: the value of each tag, by number
+        """
+        self.vocabulary = vocabulary
+        self.by_number = by_number
+
+    def __getitem__(self, tag: str):
+        return self.by_number[self.vocabulary[tag]]
+
+    def __contains__(self, tag):
+        return tag in self.vocabulary
+
+    def __iter__(self):
+        return iter(self.vocabulary)
+
+    def __len__(self):
+        return len(self.vocabulary)
+
+
+class _Columns(Sequence):
+    """
+    The bitsets of the tags of a section, each one is read from its bytes in the pack when it is used
+    """
+    __slots__ = ("raw", "size")
+
+    def __init__(self, raw: memoryview, size: int):
+        self.raw = raw
+        self.size = size  # the number of bytes of a bitset
+
+    def __len__(self):
+        return len(self.raw) // self.size if self.size else 0
+
+    def __getitem__(self, i: int) -> int:
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return int.from_bytes(self.raw[i * self.size:(i + 1) * self.size], "little")
+
+
+class _Positions(_Slices):
+    """
+    The positions of the traits carrying each tag of a section
+    """
+    __slots__ = ()
+
+    def __getitem__(self, i: int) -> frozenset:
+        return frozenset(super().__getitem__(i))
+
+
+class _TagSets(Sequence):
+    """
+    The tags of each trait of a section, the distinct tag sets are stored once in the pack
+    """
+    __slots__ = ("vocabulary", "sets", "trait_sets")
+
+    def __init__(self, vocabulary: Sequence[str], sets: _Slices, trait_sets: memoryview):
+        self.vocabulary = vocabulary
+        self.sets = sets
+        self.trait_sets = trait_sets
+
+    def __len__(self):
+        return len(self.trait_sets)
+
+    def __getitem__(self, position: int) -> frozenset:
+        return frozenset(map(self.vocabulary.__getitem__, self.sets[self.trait_sets[position]]))
+
+
+class _Items(Sequence):
+    """
+    The (trait, comma separated tags) pairs of a section
+    """
+    __slots__ = ("traits", "raw_tags")
+
+    def __init__(self, traits: _Strings, raw_tags: _Strings):
+        self.traits = traits
+        self.raw_tags = raw_tags
+
+    def __len__(self):
+        return len(self.traits)
+
+    def __getitem__(self, position: int) -> Tuple[str, str]:
+        return self.traits[position], self.raw_tags[position]
+
+
+def compile_pack(pack_path: str = "content.pack", npc_path: str = "npc.ini", stats_path: str = "stats.ini"):
+    """
+    compile the content files into a single binary pack, loaded by ContentPack without parsing anything. The pack is
+    written aside then moved in place, so the processes still mapping the old one are not disturbed
+    :param pack_path: the path to the pack to write
+    :param npc_path: the path to the traits config file
+    :param stats_path: the path to the stats file
+    """
+    hashes = source_hashes(npc_path, stats_path)
+    npc = ConfigParser()
+    npc.read(npc_path, "utf8")
+    index = TraitIndex.from_config(npc)
+    writer = _Writer()
+
+    sections_offset = len(writer.buffer)
+    writer.pack(PAIR, len(index.sections), 0)
+    for section in index.sections.values():
+        size = len(section)
+        vocabulary = {tag: i for i, tag in enumerate(section.vocabulary)}
+        # most traits share their tags with many others, each distinct tag set is stored once
+        tag_sets = dict.fromkeys(tuple(sorted(vocabulary[tag] for tag in trait_tags)) for trait_tags in section.tags)
+        tag_sets = {tag_set: i for i, tag_set in enumerate(tag_sets)}
+        offsets = [0]
+        for tag_set in tag_sets:
+            offsets.append(offsets[-1] + len(tag_set))
+        writer.pack(SECTION, writer.string(section.name), size, len(vocabulary), len(tag_sets), offsets[-1],
+                    section.weights is not None)
+        writer.array("I", (writer.string(trait) for trait, _ in section.items))
+        writer.array("I", (writer.string(raw_tags) for _, raw_tags in section.items))
+        writer.array("I", (writer.string(tag) for tag in section.vocabulary))
+        writer.array("I", offsets)
+        writer.array("I", (reference for tag_set in tag_sets for reference in tag_set))
+        writer.array("I", (
+            tag_sets[tuple(sorted(vocabulary[tag] for tag in trait_tags))] for trait_tags in section.tags
+        ))
+        # the traits carrying each tag, as positions and as a bitset
+        offsets = [0]
+        for tag in section.vocabulary:
+            offsets.append(offsets[-1] + len(section.inverted[tag]))
+        writer.array("I", offsets)
+        writer.array("I", (position for tag in section.vocabulary for position in sorted(section.inverted[tag])))
+        for tag in section.vocabulary:
+            writer.buffer += section.columns[tag].to_bytes((size + 7) // 8, "little")
+        writer.align()
+        # the traits sorted, with their positions, to find a trait by bisection
+        order = sorted(range(size), key=section.traits.__getitem__)
+        writer.array("I", (writer.string(section.traits[position]) for position in order))
+        writer.array("I", order)
+        if section.weights is not None:
+            writer.array("d", section.weights)
+            writer.array("d", section.alias.probabilities)
+            writer.array("I", section.alias.aliases)
+
+    stats_offset = len(writer.buffer)
+    stats = StatsTable.load(stats_path)
+    writer.pack(PAIR, len(stats), 0)
+    for game, rows in stats.items():
+        keys = sorted(rows)  # to find a key by bisection
+        writer.pack(PAIR, writer.string(game), len(keys))
+        offsets = [0]
+        for key in keys:
+            offsets.append(offsets[-1] + len(rows[key]))
+        writer.array("I", map(writer.string, keys))
+        writer.array("I", offsets)
+        writer.array("i", (value for key in keys for value in rows[key]))
+
+    feminine_offset = len(writer.buffer)
+    writer.pack(PAIR, len(index.feminine), 0)
+    writer.array("I", (writer.string(string) for item in index.feminine.items() for string in item))
+
+    # the forms of the traits in a NPC, as the renderer computes them
+    renderer_offset = len(writer.buffer)
+    renderer = Renderer(index)
+    writer.pack(PAIR, len(renderer.forms), 0)
+    for section_name, forms in renderer.forms.items():
+        writer.pack(PAIR, writer.string(section_name), len(forms.masculine))
+        for strings in (forms.masculine, forms.feminine, forms.determiners):
+            writer.array("I", map(writer.string, strings))
+    writer.sorted_map(renderer.genders.feminine)
+    writer.sorted_map(renderer.determiners)
+    writer.pack(PAIR, len(renderer.genders.masculine), 0)
+    for sec, masculine in renderer.genders.masculine.items():
+        writer.pack(PAIR, writer.string(sec), 0)
+        writer.sorted_map(masculine)
+
+    encoded = [string.encode("utf8") for string in writer.strings]
+    offsets = [0]
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+    blob = b"".join(encoded)
+    strings = PAIR.pack(len(encoded), len(blob)) + array("I", offsets).tobytes() + bytes(-4 * len(offsets) % 8) + \
+        blob + bytes(-len(blob) % 8)
+    base = HEADER.size + len(strings)
+    header = HEADER.pack(PACK_MAGIC, PACK_VERSION, BYTE_ORDER, *hashes, HEADER.size, base + sections_offset,
+                         base + stats_offset, base + feminine_offset,
+                         base + renderer_offset)
+    temporary = f"{pack_path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(header + strings + writer.buffer)
+    os.replace(temporary, pack_path)
+
+
+class ContentPack:
+    """
+    A compiled content pack mapped in memory. Everything is read in place from the mapping, which is shared by every
+    process opening the same file: the strings are decoded when they are used, only a bounded number of them being
+    kept, and the bitsets are rebuilt each time, so a process keeps almost none of the content for itself however
+    large it is
+    """
+
+    def __init__(self, path: str = "content.pack", cache_size: int = 4096):
+        """
+        :param path: the path to the pack
+        :param cache_size: the number of decoded strings kept, the most recently used ones
+        :raise PackError: if the file is not a pack of this version
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            try:
+                self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise PackError(f"{path} is empty") from None
+        self.view = memoryview(self.map)
+        try:
+            magic, version, byte_order, *rest = HEADER.unpack_from(self.view)
+        except struct.error:
+            raise PackError(f"{path} is too short to be a content pack") from None
+        if magic != PACK_MAGIC:
+            raise PackError(f"{path} is not a content pack")
+        if version != PACK_VERSION:
+            raise PackError(f"{path} is a content pack of version {version}, expected {PACK_VERSION}")
+        if byte_order != BYTE_ORDER or sys.byteorder != "little":
+            raise PackError(f"{path} was compiled on a machine of another byte order")
+        self.hashes = tuple(rest[:2])
+        strings_offset, self.sections_offset, self.stats_offset, self.feminine_offset, self.renderer_offset = rest[2:]
+        reader = _Reader(self.view, strings_offset)
+        count, size = reader.unpack(PAIR)
+        self.strings: Sequence[str] = _StringTable(reader.array("I", count + 1), reader.raw(size), cache_size)
+
+    def fresh(self, npc_path: str = "npc.ini", stats_path: str = "stats.ini") -> bool:
+        """
+        :return: True if the pack was compiled from the current version of the content files
+        """
+        return self.hashes == source_hashes(npc_path, stats_path)
+
+    def index(self) -> TraitIndex:
+        """
+        :return: the compiled index of the traits, as TraitIndex.from_config would build it, its tables are views of
+        the pack
+        """
+        strings = self.strings
+        reader = _Reader(self.view, self.sections_offset)
+        count, _ = reader.unpack(PAIR)
+        sections = dict()
+        for _ in range(count):
+            name, size, vocabulary_size, tag_sets_count, references_count, weighted = reader.unpack(SECTION)
+            name = strings[name]
+            traits = _Strings(strings, reader.array("I", size))
+            raw_tags = _Strings(strings, reader.array("I", size))
+            vocabulary = tuple(_Strings(strings, reader.array("I", vocabulary_size)))
+            numbers = {tag: i for i, tag in enumerate(vocabulary)}
+            tag_sets = _Slices(reader.array("I", tag_sets_count + 1), reader.array("I", references_count))
+            tags = _TagSets(vocabulary, tag_sets, reader.array("I", size))
+            offsets = reader.array("I", vocabulary_size + 1)
+            inverted = _TagMap(numbers, _Positions(offsets, reader.array("I", offsets[vocabulary_size])))
+            column_bytes = (size + 7) // 8
+            columns = _TagMap(numbers, _Columns(reader.raw(vocabulary_size * column_bytes), column_bytes))
+            lookup = _SortedMap(_Strings(strings, reader.array("I", size)), reader.array("I", size))
+            weights = alias = None
+            if weighted:
+                weights = reader.array("d", size)
+                alias = AliasTable.restore(reader.array("d", size), reader.array("I", size))
+            sections[name] = SectionIndex.restore(
+                name, _Items(traits, raw_tags), tags, vocabulary, columns, weights, alias, inverted, traits, lookup
+            )
+        reader = _Reader(self.view, self.feminine_offset)
+        count, _ = reader.unpack(PAIR)
+        items = reader.array("I", 2 * count)
+        feminine = {strings[items[i]]: strings[items[i + 1]] for i in range(0, 2 * count, 2)}
+        return TraitIndex(sections, feminine=feminine)
+
+    def renderer(self, index: TraitIndex) -> Renderer:
+        """
+        :param index: the index of the pack
+        :return: the renderer of the index, as Renderer would build it, its forms are views of the pack
+        """
+        strings = self.strings
+        reader = _Reader(self.view, self.renderer_offset)
+        count, _ = reader.unpack(PAIR)
+        forms = dict()
+        for _ in range(count):
+            name, size = reader.unpack(PAIR)
+            forms[strings[name]] = SectionForms.restore(*(_Strings(strings, reader.array("I", size)) for _ in range(3)))
+        feminine = self._sorted_map(reader)
+        determiners = self._sorted_map(reader)
+        count, _ = reader.unpack(PAIR)
+        masculine = dict()
+        for _ in range(count):
+            name, _ = reader.unpack(PAIR)
+            masculine[strings[name]] = self._sorted_map(reader)
+        return Renderer.restore(index, GenderTable.restore(feminine, masculine), forms, determiners)
+
+    def _sorted_map(self, reader: _Reader) -> "_SortedMap":
+        """
+        :return: the mapping of strings written by _Writer.sorted_map at the offset of the reader
+        """
+        size, _ = reader.unpack(PAIR)
+        keys = _Strings(self.strings, reader.array("I", size))
+        return _SortedMap(keys, _Strings(self.strings, reader.array("I", size)))
+
+    def stats(self) -> Dict[str, Mapping[str, memoryview]]:
+        """
+        :return: a dict giving for each game (in upper case) the stats of every specie and job, as StatsTable.load
+        would give them
+        """
+        strings = self.strings
+        reader = _Reader(self.view, self.stats_offset)
+        count, _ = reader.unpack(PAIR)
+        table = dict()
+        for _ in range(count):
+            game, size = reader.unpack(PAIR)
+            keys = _Strings(strings, reader.array("I", size))
+            offsets = reader.array("I", size + 1)
+            table[strings[game]] = _SortedMap(keys, _Slices(offsets, reader.array("i", offsets[size])))
+        return table
+
+    def close(self):
+        """
+        unmap the pack, the index, renderer and stats read from it must be dropped first as they are views of it
+        """
+        self.strings.decode.cache_clear()
+        self.strings.offsets.release()
+        self.strings.blob.release()
+        self.view.release()
+        self.map.close()
+
+
+def load_pack(pack_path: str = "content.pack", npc_path: str = "npc.ini", stats_path: str = "stats.ini") -> ContentPack:
+    """
+    open the content pack, compiling it again first if it is missing, of another version or older than the files
+    :return: the pack
+    """
+    try:
+        pack = ContentPack(pack_path)
+        if pack.fresh(npc_path, stats_path):
+            return pack
+        pack.close()
+    except (OSError, PackError):
+        pass
+    compile_pack(pack_path, npc_path, stats_path)
+    return ContentPack(pack_path)
+
+
+def main():
+    if len(sys.argv) > 4 or any(arg in ("-h", "--help") for arg in sys.argv[1:]):
+        print("usage: python -m content_pack [pack_path [npc_path [stats_path]]]")
+        return
+    compile_pack(*sys.argv[1:])
+    pack = ContentPack(*sys.argv[1:2])
+    print(f"Compiled {pack.path}: {len(pack.map)} bytes, {len(pack.strings)} strings")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import csv
+import json
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, TextIO
+
+FIELDS = ("name", "gender", "job", "specie", "appearance", "behavior", "personality", "accessories")
+
+
+def chunks(npcs: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    """
+    group NPCs in lists of a given size, the last one may be shorter
+    :param npcs: the NPCs to group, usually NPCGenerator.stream
+    :param size: the number of NPCs per list
+    :return: an iterator over the lists
+    """
+    npcs = iter(npcs)
+    chunk = list(islice(npcs, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(npcs, size))
+
+
+def write_jsonl(npcs: Iterable[dict], file: TextIO, chunk_size: int = 1024) -> int:
+    """
+    write NPCs as JSON Lines, one NPC per line
+    :param npcs: the NPCs to write, usually NPCGenerator.stream
+    :param file: the text file to write in
+    :param chunk_size: the number of NPCs written at once
+    :return: the number of NPCs written
+    """
+    written = 0
+    for chunk in chunks(npcs, chunk_size):
+        file.write("".join(json.dumps(npc, ensure_ascii=False) + "\n" for npc in chunk))
+        written += len(chunk)
+    return written
+
+
+def write_csv(npcs: Iterable[dict], file: TextIO, chunk_size: int = 1024) -> int:
+    """
+    write NPCs as CSV, with a header line
+    :param npcs: the NPCs to write, usually NPCGenerator.stream
+    :param file: the text file to write in, opened with newline=""
+    :param chunk_size: the number of NPCs written at once
+    :return: the number of NPCs written
+    """
+    writer = csv.DictWriter(file, FIELDS)
+    writer.writeheader()
+    written = 0
+    for chunk in chunks(npcs, chunk_size):
+        writer.writerows(chunk)
+        written += len(chunk)
+    return written
+
+
+def columnar_chunks(npcs: Iterable[dict], chunk_size: int = 65536) -> Iterator[Dict[str, list]]:
+    """
+    turn NPCs into column chunks, like row groups in a Parquet file
+    :param npcs: the NPCs to convert, usually NPCGenerator.stream
+    :param chunk_size: the number of NPCs per chunk
+    :return: an iterator over dicts giving the list of values of each field
+    """
+    for chunk in chunks(npcs, chunk_size):
+        yield {field: [npc[field] for npc in chunk] for field in FIELDS}
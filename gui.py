@@ -1,13 +1,19 @@
 import sys
+from collections import OrderedDict
 from configparser import ConfigParser
 
-from PySide2.QtCore import Qt
+from typing import Callable, Optional
+
+from PySide2.QtCore import Qt, QTimer, QObject, QRunnable, QThreadPool, Signal
 from PySide2.QtGui import QClipboard, QFont
 from PySide2.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QPushButton, QWidget, QTabWidget, \
-    QLineEdit, QHBoxLayout, QLabel, QCheckBox, QComboBox, QTextEdit, QGroupBox, QDialog
+    QLineEdit, QHBoxLayout, QLabel, QCheckBox, QComboBox, QTextEdit, QGroupBox, QDialog, QSpinBox
 
-from manager import NPCGenerator, apply_gender
+from manager import NPCGenerator
 from constant_strings import *
+from reloader import ContentWatcher, watch_generator
+
+MAX_BUILT_TABS = 8  # the tabs beyond that drop their widgets, the least recently shown first
 
 
 class Window(QMainWindow):
@@ -18,21 +24,223 @@ class Window(QMainWindow):
         self.npc_config = ConfigParser()
         self.npc_config.read("npc.ini", "utf8")
         self.npc = NPCGenerator(self.npc_config)
+        self.tool_tip = ConfigParser()  # shared by every panel
+        self.tool_tip.read("descriptions.ini", "utf-8")
+        self.built_tabs = OrderedDict()  # the tabs holding a panel, least recently shown first
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
         self.central_layout = QVBoxLayout()
         self.central_widget.setLayout(self.central_layout)
         self.tabs = QTabWidget()
+        self.tabs.currentChanged.connect(self.show_tab)
         self.central_layout.addWidget(self.tabs)
         self.nb_npc = 1
-        self.tabs.addTab(GeneratorPanel(self.npc, self), "PNJ 1")
+        self.tabs.addTab(LazyTab(self), "PNJ 1")
+        self.show_tab(self.tabs.currentIndex())
         self.add_npc_button = QPushButton("Ajouter PNJ")
         self.add_npc_button.clicked.connect(lambda: self.add_npc())
         self.central_layout.addWidget(self.add_npc_button)
 
+        batch_line = QHBoxLayout()
+        self.batch_count = QSpinBox()
+        self.batch_count.setRange(1, 50)
+        self.batch_count.setValue(5)
+        batch_line.addWidget(self.batch_count)
+        self.batch_button = QPushButton("Générer N PNJ")
+        self.batch_button.clicked.connect(lambda: self.generate_batch())
+        batch_line.addWidget(self.batch_button)
+        self.cancel_batch_button = QPushButton("Annuler")
+        self.cancel_batch_button.setEnabled(False)
+        self.cancel_batch_button.clicked.connect(lambda: self.cancel_batch())
+        batch_line.addWidget(self.cancel_batch_button)
+        self.central_layout.addLayout(batch_line)
+        self.batch_tasks = list()
+        self.batch_results = list()
+        self.batch_id = 0  # the results of a cancelled batch may still be waiting in the event queue
+
+        # the content files are checked from the Qt event loop, so the panels are only touched from the GUI thread
+        self.watcher = ContentWatcher()
+        watch_generator(self.watcher, self.npc, "npc.ini")
+        self.watcher.watch("descriptions.ini", lambda path: self.reload_descriptions(path))
+        self.watch_timer = QTimer(self)
+        self.watch_timer.timeout.connect(lambda: self.watcher.check())
+        self.watch_timer.start(int(self.watcher.interval * 1000))
+
+    def reload_descriptions(self, path: str):
+        tool_tip = ConfigParser()
+        tool_tip.read(path, "utf-8")
+        self.tool_tip = tool_tip
+
     def add_npc(self):
         self.nb_npc += 1
-        self.tabs.addTab(GeneratorPanel(self.npc, self), f"PNJ {self.nb_npc}")
+        self.tabs.addTab(LazyTab(self), f"PNJ {self.nb_npc}")
+
+    def generate_batch(self):
+        """
+        open N new tabs and generate their NPCs in parallel, with the tags of the current tab. The tabs are filled all
+        at once when every NPC is ready
+        """
+        self.cancel_batch()
+        batch_id = self.batch_id
+        current = self.tabs.currentWidget()
+        tags = current.tags_text() if current is not None else ""
+        for _ in range(self.batch_count.value()):
+            self.nb_npc += 1
+            tab = LazyTab(self)
+            tab.state.tags = tags
+            self.tabs.addTab(tab, f"PNJ {self.nb_npc}")
+            task = GenerationTask(self.npc.generate, *tags.split(', '))
+            task.signals.done.connect(lambda traits, tab=tab: self.batch_done(batch_id, tab, traits))
+            task.signals.failed.connect(lambda message: self.batch_done(batch_id, None, None, message))
+            self.batch_tasks.append(task)
+            QThreadPool.globalInstance().start(task)
+        self.cancel_batch_button.setEnabled(True)
+
+    def batch_done(self, batch_id: int, tab: Optional["LazyTab"], traits: Optional[dict], error: str = None):
+        if batch_id != self.batch_id:
+            return
+        if error is not None:
+            self.show_error(error)
+        self.batch_results.append((tab, traits))
+        if len(self.batch_results) < len(self.batch_tasks):
+            return
+        self.tabs.setUpdatesEnabled(False)  # a single repaint for the whole batch
+        for tab, traits in self.batch_results:
+            if traits is not None:
+                tab.set_generated(traits)
+                self.tabs.setTabText(self.tabs.indexOf(tab), traits["name"])
+        self.tabs.setUpdatesEnabled(True)
+        self.batch_tasks.clear()
+        self.batch_results.clear()
+        self.cancel_batch_button.setEnabled(False)
+
+    def cancel_batch(self):
+        """
+        forget the NPCs of the batch still being generated, their tabs stay empty
+        """
+        for task in self.batch_tasks:
+            task.cancel()
+        self.batch_id += 1
+        self.batch_tasks.clear()
+        self.batch_results.clear()
+        self.cancel_batch_button.setEnabled(False)
+
+    def show_error(self, message: str):
+        self.statusBar().showMessage(message, 5000)
+
+    def show_tab(self, index: int):
+        """
+        build the panel of the shown tab if needed, and drop the panels of the tabs not shown for the longest time
+        :param index: the index of the shown tab, -1 if there is none
+        """
+        tab = self.tabs.widget(index)
+        if tab is None:
+            return
+        tab.build()
+        self.built_tabs[tab] = None
+        self.built_tabs.move_to_end(tab)
+        while len(self.built_tabs) > MAX_BUILT_TABS:
+            self.built_tabs.popitem(last=False)[0].drop()
+
+
+class GenerationSignals(QObject):
+    done = Signal(object)
+    failed = Signal(str)
+
+
+class GenerationTask(QRunnable):
+    """
+    Run a function in the Qt thread pool and send its result to the GUI thread, unless the task was cancelled. A
+    task already running cannot be stopped, its result is dropped instead
+    """
+
+    def __init__(self, func: Callable, *args):
+        super(GenerationTask, self).__init__()
+        self.func = func
+        self.args = args
+        self.signals = GenerationSignals()
+        self.cancelled = False  # a plain attribute, still readable once Qt deleted the task after running it
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        if self.cancelled:
+            return
+        try:
+            result = self.func(*self.args)
+        except Exception as error:
+            if not self.cancelled:
+                self.signals.failed.emit(f"La génération a échoué : {error}")
+            return
+        if not self.cancelled:
+            self.signals.done.emit(result)
+
+
+class PanelState:
+    """
+    What a panel shows, kept when its widgets are dropped
+    """
+    __slots__ = ("tags", "texts", "fixes", "game", "stats", "notes", "gender", "last_job")
+
+    def __init__(self):
+        self.tags = ""
+        self.texts = ("",) * 7  # name, job, specie, appearance, behavior, personality, accessories
+        self.fixes = (False,) * 7
+        self.game = ""
+        self.stats = ("",) * 6
+        self.notes = ""
+        self.gender = ""
+        self.last_job = ""
+
+
+class LazyTab(QWidget):
+    """
+    A tab whose panel is only built when it is shown, and can be dropped again while keeping its state
+    """
+
+    def __init__(self, window: Window):
+        super(LazyTab, self).__init__(window)
+        self.window_ = window
+        self.state = PanelState()
+        self.panel = None
+        self.layout = QVBoxLayout()
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(self.layout)
+
+    def build(self):
+        if self.panel is None:
+            self.panel = GeneratorPanel(self.window_.npc, self.window_)
+            self.panel.load_state(self.state)
+            self.layout.addWidget(self.panel)
+
+    def tags_text(self) -> str:
+        return self.panel.tags.text() if self.panel is not None else self.state.tags
+
+    def set_generated(self, traits: dict):
+        """
+        show a generated NPC, in the panel if it is built or else in its saved state
+        :param traits: the generated NPC
+        """
+        if self.panel is not None:
+            self.panel.set_generated(traits)
+            return
+        state = self.state
+        state.gender = traits["gender"]
+        state.texts = tuple(
+            old if fixed else new
+            for old, new, fixed in zip(state.texts, self.window_.npc.renderer.fields(traits), state.fixes)
+        )
+        if not state.fixes[1]:
+            state.last_job = traits["job"]
+
+    def drop(self):
+        if self.panel is not None:
+            self.panel.cancel()
+            self.state = self.panel.save_state()
+            self.layout.removeWidget(self.panel)
+            self.panel.deleteLater()
+            self.panel = None
 
 
 class GeneratorPanel(QWidget):
@@ -42,11 +250,9 @@ class GeneratorPanel(QWidget):
         self.npc = npc_generator
         self.layout = QVBoxLayout()
 
-        self.tool_tip = ConfigParser()
-        self.tool_tip.read("descriptions.ini", "utf-8")
-
         self.gender = ""
         self.last_job = ""
+        self.tasks = dict()  # the generations running for this panel, by kind
 
         self.tag_line = QHBoxLayout()
         self.tag_line.addWidget(QLabel("Tags :"))
@@ -242,6 +448,52 @@ class GeneratorPanel(QWidget):
 
         self.setLayout(self.layout)
 
+    def save_state(self) -> PanelState:
+        """
+        :return: what the panel shows, to build it again later
+        """
+        state = PanelState()
+        state.tags = self.tags.text()
+        state.texts = tuple(label.text() for label in self.labels())
+        state.fixes = tuple(box.isChecked() for box in self.fixes)
+        state.game = self.game_combo.currentText()
+        state.stats = tuple(stat.text() for stat in self.stats())
+        state.notes = self.additional_note.toPlainText()
+        state.gender = self.gender
+        state.last_job = self.last_job
+        return state
+
+    def load_state(self, state: PanelState):
+        """
+        show a saved state in the panel
+        :param state: what the panel showed, given by save_state
+        """
+        self.tags.setText(state.tags)
+        for label, text in zip(self.labels(), state.texts):
+            label.setText(text)
+        for box, fixed in zip(self.fixes, state.fixes):
+            box.setChecked(fixed)
+        if state.game:
+            self.game_combo.setCurrentText(state.game)
+        for stat, text in zip(self.stats(), state.stats):
+            stat.setText(text)
+        self.additional_note.setPlainText(state.notes)
+        self.gender = state.gender
+        self.last_job = state.last_job
+        if self.last_job:
+            self.job_label.setToolTip(self.parent.tool_tip["JOBS"].get(self.last_job, "Occupation inconnue"))
+        if self.specie_label.text():
+            self.specie_label.setToolTip(
+                self.parent.tool_tip["SPECIES"].get(self.specie_label.text(), "Espèce inconnue")
+            )
+
+    def labels(self):
+        return (self.name_label, self.job_label, self.specie_label, self.appearance_label, self.behavior_label,
+                self.personality_label, self.accessories_label)
+
+    def stats(self):
+        return self.stat_1, self.stat_2, self.stat_3, self.stat_4, self.stat_5, self.stat_6
+
     def set_all_fixes(self):
         for box in self.fixes:
             box.setChecked(True)
@@ -254,40 +506,43 @@ class GeneratorPanel(QWidget):
         for box in self.fixes:
             box.setChecked(not box.isChecked())
 
+    def start(self, kind: str, task: GenerationTask, on_done: Callable):
+        """
+        run a generation off the GUI thread, a generation of the same kind still running is cancelled
+        :param kind: the kind of generation
+        :param task: the generation
+        :param on_done: the function called in the GUI thread with the result
+        """
+        if kind in self.tasks:
+            self.tasks.pop(kind).cancel()
+        self.tasks[kind] = task
+        task.signals.done.connect(on_done)
+        task.signals.failed.connect(self.parent.show_error)
+        QThreadPool.globalInstance().start(task)
+
+    def cancel(self):
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
+
     def get_generated(self):
-        traits = self.npc.generate(*self.tags.text().split(', '))
+        self.start("generate", GenerationTask(self.npc.generate, *self.tags.text().split(', ')), self.set_generated)
+
+    def set_generated(self, traits: dict):
+        self.tasks.pop("generate", None)
+        self.setUpdatesEnabled(False)  # the fields are repainted once, after all of them changed
         self.gender = traits["gender"]
-        if self.gender == WOM:
-            e_gender = 'e'
-        else:
-            e_gender = ""
-        if FEM in self.npc.tags[traits['accessories'].upper()]:
-            det_accessories = "une"
-        elif MASC in self.npc.tags[traits['accessories'].upper()]:
-            det_accessories = "un"
-        elif PLUR in self.npc.tags[traits['accessories'].upper()]:
-            det_accessories = "de"
-        elif PLURS in self.npc.tags[traits['accessories'].upper()]:
-            det_accessories = "des"
-        else:
-            det_accessories = ""
-        if not self.fix_name.isChecked():
-            self.name_label.setText(traits['name'])
+        for label, box, text in zip(self.labels(), self.fixes, self.npc.renderer.fields(traits)):
+            if not box.isChecked():
+                label.setText(text)
         if not self.fix_job.isChecked():
-            self.job_label.setText(f"un{e_gender} {traits['job']}")
-            self.job_label.setToolTip(self.tool_tip["JOBS"].get(traits['job'], "Occupation inconnue"))
+            self.job_label.setToolTip(self.parent.tool_tip["JOBS"].get(traits['job'], "Occupation inconnue"))
             self.last_job = traits["job"]
         if not self.fix_specie.isChecked():
-            self.specie_label.setText(traits['specie'])
-            self.specie_label.setToolTip(self.tool_tip["SPECIES"].get(self.specie_label.text(), "Espèce inconnue"))
-        if not self.fix_appearance.isChecked():
-            self.appearance_label.setText(traits['appearance'])
-        if not self.fix_behavior.isChecked():
-            self.behavior_label.setText(traits['behavior'])
-        if not self.fix_personality.isChecked():
-            self.personality_label.setText(traits['personality'])
-        if not self.fix_accessories.isChecked():
-            self.accessories_label.setText(f"{det_accessories} {traits['accessories']}")
+            self.specie_label.setToolTip(
+                self.parent.tool_tip["SPECIES"].get(self.specie_label.text(), "Espèce inconnue")
+            )
+        self.setUpdatesEnabled(True)
 
     def set_tab_name(self):
         self.parent.tabs.setTabText(self.parent.tabs.currentIndex(), self.name_label.text())
@@ -315,21 +570,22 @@ class GeneratorPanel(QWidget):
             self.stat_6_group.setTitle("Charisme")
 
     def get_characteristics(self):
-        job_key = self.last_job \
-            if self.gender == MAN and GENDERED in self.npc.tags[self.last_job.upper()] \
-            else apply_gender(self.last_job)
-        stat_1, stat_2, stat_3, stat_4, stat_5, stat_6 = \
-            self.npc.get_characteristics(
-                GAMES[self.game_combo.currentText()],
-                self.specie_label.text().upper(),
-                job_key
-            )
+        job_key = self.npc.job_key(self.last_job)
+        game = GAMES[self.game_combo.currentText()]
+        task = GenerationTask(self.npc.get_characteristics, game, self.specie_label.text().upper(), job_key)
+        self.start("characteristics", task, self.show_characteristics)
+
+    def show_characteristics(self, characteristics):
+        self.tasks.pop("characteristics", None)
+        stat_1, stat_2, stat_3, stat_4, stat_5, stat_6 = characteristics
+        self.setUpdatesEnabled(False)
         self.stat_1.setText(f"{stat_1}")
         self.stat_2.setText(f"{stat_2}")
         self.stat_3.setText(f"{stat_3}")
         self.stat_4.setText(f"{stat_4}")
         self.stat_5.setText(f"{stat_5}")
         self.stat_6.setText(f"{stat_6}")
+        self.setUpdatesEnabled(True)
 
     def tags_selection(self):
         def add_tags():
@@ -0,0 +1,129 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple
+
+
+class Instrumentation:
+    """
+    Counters and stage timings of a generator. A generator only collects them when it is given an instrumentation,
+    so when it is off the hot path pays a None check per stage and nothing else
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = Counter()  # i.e. the number of times the tags were relaxed in each section
+        self.stages: Dict[str, List[float]] = dict()  # stage -> [calls, total seconds, max seconds]
+        self.started = time.time()
+
+    @staticmethod
+    def clock() -> float:
+        return time.perf_counter()
+
+    def count(self, key: str, n: int = 1):
+        with self.lock:
+            self.counters[key] += n
+
+    def record(self, stage: str, seconds: float):
+        """
+        add a call to the timing of a stage
+        :param stage: the name of the stage
+        :param seconds: the time spent in the call
+        """
+        with self.lock:
+            timing = self.stages.get(stage)
+            if timing is None:
+                self.stages[stage] = [1, seconds, seconds]
+            else:
+                timing[0] += 1
+                timing[1] += seconds
+                if seconds > timing[2]:
+                    timing[2] = seconds
+
+    def lap(self, stage: str, since: float) -> float:
+        """
+        record the time spent in a stage since a clock reading, to chain the stages of a pipeline
+        :param stage: the name of the stage that just ended
+        :param since: the clock when it started
+        :return: the clock now, when the next stage starts
+        """
+        now = time.perf_counter()
+        self.record(stage, now - since)
+        return now
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.stages.clear()
+            self.started = time.time()
+
+    def stats(self) -> dict:
+        """
+        :return: a snapshot of the counters and of the timings of each stage, the times are in microseconds
+        """
+        with self.lock:
+            return {
+                "since": time.time() - self.started, "counters": dict(self.counters),
+                "stages": {
+                    stage: {"calls": calls, "mean_us": total / calls * 1e6, "max_us": longest * 1e6,
+                            "total_s": total}
+                    for stage, (calls, total, longest) in self.stages.items()
+                }
+            }
+
+
+def capture(func: Callable, *args, profile: bool = True, memory: bool = False, limit: int = 15) -> Tuple[Any, str]:
+    """
+    run a single call under the profiler and/or the memory tracer, to look into one slow request
+    :param func: the function to call
+    :param args: its arguments
+    :param profile: profile the call with cProfile
+    :param memory: trace the memory allocated by the call with tracemalloc
+    :param limit: the number of functions and of allocation sites reported
+    :return: what the function returned and the report of the call
+    """
+    profiler = cProfile.Profile() if profile else None
+    tracing = memory and not tracemalloc.is_tracing()  # someone else may already be tracing
+    if tracing:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        if profiler is not None:
+            result = profiler.runcall(func, *args)
+        else:
+            result = func(*args)
+        report = [f"{(time.perf_counter() - start) * 1000:.2f} ms"]
+        if memory and tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            report.append(f"peak memory: {peak / 1024:.1f} KiB")
+            report.extend(str(line) for line in tracemalloc.take_snapshot().statistics("lineno")[:limit])
+    finally:
+        if tracing:
+            tracemalloc.stop()
+    if profiler is not None:
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).strip_dirs().sort_stats("cumulative").print_stats(limit)
+        report.append(output.getvalue().strip())
+    return result, "\n".join(report)
+
+
+def format_stats(stats: dict, indent: str = "") -> str:
+    """
+    :param stats: a snapshot, as given by the stats methods, the dicts may be nested
+    :param indent: the prefix of each line
+    :return: the snapshot, one value per line
+    """
+    lines = list()
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            lines.append(f"{indent}{key}:")
+            lines.append(format_stats(value, indent + "  "))
+        elif isinstance(value, float):
+            lines.append(f"{indent}{key}: {value:.3f}")
+        else:
+            lines.append(f"{indent}{key}: {value}")
+    return "\n".join(line for line in lines if line)
@@ -1,8 +1,478 @@
+from argparse import ArgumentParser
 from configparser import ConfigParser
+import os
 import random
-from typing import Tuple, Union
+import re
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict
+from itertools import repeat
+from operator import add
+from statistics import NormalDist
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
 
+from alias import AliasTable
 from constant_strings import *
+from instrumentation import Instrumentation
+from name_registry import NameRegistry
+from trait_index import SectionIndex, TraitIndex, bit_positions, nth_bit, popcount
+
+
+class NoMatchingTrait(LookupError):
+    """
+    Raised when no trait of a section can match the requested tags
+    """
+
+    def __init__(self, section: str, tags):
+        super(NoMatchingTrait, self).__init__(f"No trait of {section} matches the tags {', '.join(sorted(tags))}")
+        self.section = section
+        self.tags = frozenset(tags)
+
+
+class CandidatePool:
+    """
+    The traits of a section a draw can give for a tag combination, with the form they take in a NPC
+    """
+    __slots__ = ("positions", "forms", "decode", "alias", "outcome")
+
+    def __init__(self, positions: Sequence[int], forms: Sequence[str], weights: Optional[Sequence[float]] = None,
+                 outcome: Tuple[Tuple[str, int], ...] = ()):
+        """
+        :param positions: the positions of the traits in the section
+        :param forms: the form every trait of the section takes in a NPC, by position
+        :param weights: the weights of the whole section, None if all the traits are as likely
+        :param outcome: the (counter, amount) pairs of the fallback policy applied to get the traits, counted on every
+        draw since the pool is cached
+        """
+        self.positions = array("I", positions)  # 4 bytes a candidate rather than an int object
+        # the forms of the candidates are the strings of the renderer, or for the forms read from a content pack their
+        # ids in the pack with the function decoding them, so that a form is only decoded when it is drawn
+        self.decode = getattr(forms, "decode", None)
+        if self.decode is None:
+            self.forms = tuple(map(forms.__getitem__, self.positions))
+        else:
+            self.forms = array("I", map(forms.ids.__getitem__, self.positions))
+        self.alias = AliasTable([weights[p] for p in self.positions]) if weights and self.positions else None
+        self.outcome = outcome
+
+    def __len__(self):
+        return len(self.positions)
+
+    def draw(self, rng: random.Random = random) -> Optional[str]:
+        """
+        :param rng: the random generator to draw with, the global one of the random module by default
+        :return: a trait drawn with the weights of the traits, None if there is none
+        """
+        if self.alias is not None:
+            form = self.forms[self.alias.draw(rng)]
+        elif self.forms:
+            form = self.forms[rng.randrange(len(self.forms))]
+        else:
+            return None
+        return form if self.decode is None else self.decode(form)
+
+    def draw_many(self, count: int, rng: random.Random = random) -> List[Optional[str]]:
+        """
+        :param count: the number of traits to draw
+        :param rng: the random generator to draw with, the global one of the random module by default
+        :return: the traits drawn with the weights of the traits, filled with None if there is none
+        """
+        if self.alias is not None:
+            forms = list(map(self.forms.__getitem__, self.alias.draw_many(count, rng)))
+        elif self.forms:
+            forms = rng.choices(self.forms, k=count)
+        else:
+            return [None] * count
+        return forms if self.decode is None else list(map(self.decode, forms))
+
+    def draw_positions(self, count: int, rng: random.Random = random) -> List[Optional[int]]:
+        """
+        :param count: the number of traits to draw
+        :param rng: the random generator to draw with, the global one of the random module by default
+        :return: the positions of the traits drawn with their weights, filled with None if there is none
+        """
+        if self.alias is not None:
+            return list(map(self.positions.__getitem__, self.alias.draw_many(count, rng)))
+        return rng.choices(self.positions, k=count) if self.positions else [None] * count
+
+
+class LRUCache:
+    """
+    A thread safe mapping keeping only the most recently used entries, with hit and miss counters
+    """
+
+    def __init__(self, size: int):
+        """
+        :param size: the number of entries kept, 0 to keep nothing
+        """
+        self.size = size
+        self.entries = OrderedDict()  # least recently used first
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, compute: Callable):
+        """
+        get the value of a key, computing and storing it if it is not known yet
+        :param key: the key
+        :param compute: the function giving the value of a key
+        :return: the value
+        """
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.misses += 1
+        value = compute(key)  # computed outside of the lock, two threads may compute the same value
+        with self.lock:
+            self.entries[key] = value
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        """
+        :return: the counters of the cache
+        """
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / requests if requests else 0.,
+            "evictions": self.evictions, "size": len(self.entries), "max_size": self.size
+        }
+
+
+GENDER_CODES = tuple(sorted(GENDERS))  # the genders as stored in a roster
+DESCRIPTION = "{name} est un{e} {job} {specie} plutôt {appearance}, {behavior}, semble être {personality} et a " \
+              "{determiner} {accessories}"
+
+
+class GenderTable:
+    """
+    The feminine form of every gendered trait and the masculine form of every feminine one in each section, computed
+    once per compiled index. apply_gender gives the feminine forms, unless the FEMININE section of the config file gives
+    them. Two traits of different sections may share a feminine form, i.e. soigneur and soigneux, so a form is turned
+    back into a trait of a given section
+    """
+    __slots__ = ("feminine", "masculine")
+
+    def __init__(self, index: TraitIndex):
+        """
+        :param index: the compiled traits, with the feminine forms given by the config file
+        """
+        feminine = dict()
+        masculine = dict()
+        for sec, section in index.sections.items():
+            section_masculine = dict()
+            for trait, trait_tags in zip(section.traits, section.tags):
+                if GENDERED in trait_tags:
+                    if trait not in feminine:
+                        feminine[trait] = index.feminine.get(trait) or apply_gender(trait)
+                    section_masculine.setdefault(feminine[trait], trait)
+            if section_masculine:
+                masculine[sec] = MappingProxyType(section_masculine)
+        self.feminine = MappingProxyType(feminine)
+        self.masculine = MappingProxyType(masculine)
+
+    @classmethod
+    def restore(cls, feminine: Mapping[str, str], masculine: Mapping[str, Mapping[str, str]]) -> "GenderTable":
+        """
+        rebuild the table from its mappings, kept as given, i.e. read from a content pack
+        :param feminine: the feminine form of every gendered trait
+        :param masculine: the masculine form of every feminine one, by section
+        :return: the table
+        """
+        genders = cls.__new__(cls)
+        genders.feminine = feminine
+        genders.masculine = masculine
+        return genders
+
+    def feminize(self, trait: str) -> str:
+        """
+        :param trait: a trait as found in the config file
+        :return: its feminine form, the trait itself if it is not gendered
+        """
+        return self.feminine.get(trait, trait)
+
+    def masculinize(self, form: str, section: str) -> str:
+        """
+        :param form: a trait in any form
+        :param section: the section of the trait
+        :return: its masculine form, as found in the config file
+        """
+        section_masculine = self.masculine.get(section)
+        return form if section_masculine is None else section_masculine.get(form, form)
+
+
+class SectionForms:
+    """
+    The form every trait of a section takes in a NPC for each gender, computed once per compiled section
+    """
+    __slots__ = ("masculine", "feminine", "determiners")
+
+    def __init__(self, section_name: str, section: SectionIndex, genders: GenderTable):
+        """
+        :param section_name: the name of the section, the accessories are in lower case, the behaviors get their verb
+        :param section: the compiled section
+        :param genders: the feminine forms of the traits
+        """
+        if section_name == "ACCESSORIES":  # the accessories do not depend on the gender
+            masculine = feminine = tuple(trait.lower() for trait in section.traits)
+        else:
+            masculine = section.traits
+            feminine = tuple(
+                genders.feminine[trait] if GENDERED in trait_tags else trait
+                for trait, trait_tags in zip(section.traits, section.tags)
+            )
+        if section_name == "BEHAVIOR":
+            masculine = tuple(map(behavior_verb, masculine, section.tags))
+            feminine = tuple(map(behavior_verb, feminine, section.tags))
+        self.masculine = masculine
+        self.feminine = feminine
+        self.determiners = tuple(map(determiner, section.tags))  # "une", "un", "de", "des" or ""
+
+    @classmethod
+    def restore(cls, masculine: Sequence[str], feminine: Sequence[str], determiners: Sequence[str]) -> "SectionForms":
+        """
+        rebuild the forms of a section from their sequences, kept as given, i.e. read from a content pack
+        :return: the forms
+        """
+        forms = cls.__new__(cls)
+        forms.masculine = masculine
+        forms.feminine = feminine
+        forms.determiners = determiners
+        return forms
+
+    def form(self, position: int, gender: Optional[str]) -> str:
+        return (self.feminine if gender == WOM else self.masculine)[position]
+
+
+class Renderer:
+    """
+    Turn NPCs into sentences. The forms of the traits, the verbs of the behaviors and the determiners of the accessories
+    are computed once per compiled index, and the description template once per gender, so a description is a single
+    format call with no tag lookup
+    """
+    templates = {gender: DESCRIPTION.replace("{e}", "e" if gender == WOM else "") for gender in GENDERS}
+
+    def __init__(self, index: TraitIndex, previous: "Renderer" = None):
+        """
+        :param index: the compiled traits
+        :param previous: the renderer of an older index, the forms of its sections that did not change are reused
+        """
+        self.index = index
+        self.genders = GenderTable(index)
+        if previous is not None and previous.genders.feminine != self.genders.feminine:
+            previous = None  # every section may use a feminine form that changed
+        self.forms = dict()
+        for section_name in NPC_SECTIONS.values():
+            section = index[section_name]
+            if previous is not None and section_name in previous.forms and previous.index[section_name] is section:
+                self.forms[section_name] = previous.forms[section_name]
+            else:
+                self.forms[section_name] = SectionForms(section_name, section, self.genders)
+        accessories = self.forms["ACCESSORIES"]
+        self.determiners = dict(zip(accessories.masculine, accessories.determiners))  # accessory -> determiner
+
+    @classmethod
+    def restore(cls, index: TraitIndex, genders: GenderTable, forms: Mapping[str, SectionForms],
+                determiners: Mapping[str, str]) -> "Renderer":
+        """
+        rebuild the renderer of an index from its tables, without computing the forms again, i.e. from a content pack
+        :param index: the compiled traits
+        :param genders: the feminine and masculine forms of the traits
+        :param forms: the forms of the traits of each section of a NPC
+        :param determiners: the determiner of each accessory
+        :return: the renderer
+        """
+        renderer = cls.__new__(cls)
+        renderer.index = index
+        renderer.genders = genders
+        renderer.forms = dict(forms)
+        renderer.determiners = determiners
+        return renderer
+
+    def trait_form(self, section_name: str, position: int, gender: Optional[str]) -> str:
+        return self.forms[section_name].form(position, gender)
+
+    def describe(self, traits: dict, determiner: str = None) -> str:
+        """
+        :param traits: a NPC, as given by NPCGenerator.generate
+        :param determiner: the determiner of its accessories, found from them if None
+        :return: the description of the NPC in a sentence
+        """
+        if determiner is None:
+            determiner = self.determiners.get(traits["accessories"], "")
+        return self.templates[traits["gender"]].format_map({**traits, "determiner": determiner})
+
+    def fields(self, traits: dict) -> Tuple[str, ...]:
+        """
+        :param traits: a NPC, as given by NPCGenerator.generate
+        :return: the texts of its name, job (with its article), specie, appearance, behavior, personality and
+        accessories (with their determiner), as shown by the GUI
+        """
+        e_gender = "e" if traits["gender"] == WOM else ""
+        return (traits["name"], f"un{e_gender} {traits['job']}", traits["specie"], traits["appearance"],
+                traits["behavior"], traits["personality"],
+                f"{self.determiners.get(traits['accessories'], '')} {traits['accessories']}")
+
+
+class Roster:
+    """
+    A crowd of NPCs stored column by column in arrays: each trait is its position in its section of the index the
+    crowd was drawn from, and all the names share one utf8 buffer. A NPC takes about 30 bytes instead of a dict of
+    strings, its traits are only turned into text when they are read
+    """
+
+    def __init__(self, renderer: Renderer):
+        """
+        :param renderer: the renderer of the index the positions refer to, a roster stays valid when the generator
+        reloads its config
+        """
+        self.renderer = renderer
+        self.index = index = renderer.index
+        self.genders = bytearray()  # positions in GENDER_CODES
+        self.titles = array(self.typecode(index["TITLES"]))  # -1 if there is no title
+        self.columns = {key: array(self.typecode(index[section])) for key, section in NPC_SECTIONS.items()}
+        self.names = bytearray()
+        self.name_ends = array("I")
+
+    @staticmethod
+    def typecode(section: SectionIndex) -> str:
+        return "h" if len(section) < 2 ** 15 else "i"
+
+    def __len__(self):
+        return len(self.genders)
+
+    def __getitem__(self, row: int) -> "NPC":
+        if not -len(self) <= row < len(self):
+            raise IndexError("roster index out of range")
+        return NPC(self, row % len(self))
+
+    def __iter__(self) -> Iterator["NPC"]:
+        return map(self.__getitem__, range(len(self)))
+
+    def extend(self, gender: str, title: Optional[int], names: Sequence[str],
+               columns: Mapping[str, Sequence[Optional[int]]]):
+        """
+        add a group of NPCs sharing a gender and a title
+        :param gender: the gender of the group
+        :param title: the position of their title in TITLES, None if there is none
+        :param names: the names of the NPCs, without the title
+        :param columns: the positions of the traits of the NPCs in each section, None if nothing matched
+        """
+        self.genders.extend([GENDER_CODES.index(gender)] * len(names))
+        self.titles.extend([-1 if title is None else title] * len(names))
+        for key, column in columns.items():
+            self.columns[key].extend(-1 if position is None else position for position in column)
+        for name in names:
+            self.names += name.encode("utf8")
+            self.name_ends.append(len(self.names))
+
+    def shuffle(self, rng: random.Random = random):
+        """
+        put the NPCs in a random order
+        :param rng: the random generator to draw with, the global one of the random module by default
+        """
+        order = list(range(len(self)))
+        rng.shuffle(order)
+        self.genders = bytearray(self.genders[row] for row in order)
+        self.titles = array(self.titles.typecode, (self.titles[row] for row in order))
+        for key, column in self.columns.items():
+            self.columns[key] = array(column.typecode, (column[row] for row in order))
+        starts = [0] + self.name_ends[:-1].tolist()
+        names = bytearray()
+        name_ends = array("I")
+        for row in order:
+            names += self.names[starts[row]:self.name_ends[row]]
+            name_ends.append(len(names))
+        self.names, self.name_ends = names, name_ends
+
+    def name(self, row: int) -> str:
+        """
+        :param row: the row of the NPC
+        :return: the name of the NPC, with its title
+        """
+        start = self.name_ends[row - 1] if row else 0
+        name = self.names[start:self.name_ends[row]].decode("utf8")
+        title = self.titles[row]
+        if title >= 0:
+            name = self.index["TITLES"].traits[title].capitalize() + " " + name
+        return name
+
+    def gender(self, row: int) -> str:
+        return GENDER_CODES[self.genders[row]]
+
+    def trait(self, row: int, key: str) -> Optional[str]:
+        """
+        :param row: the row of the NPC
+        :param key: the key of the trait, as in NPC_SECTIONS
+        :return: the trait in the form it takes in the NPC, None if nothing matched
+        """
+        position = self.columns[key][row]
+        if position < 0:
+            return None
+        return self.renderer.trait_form(NPC_SECTIONS[key], position, self.gender(row))
+
+    def traits(self, row: int) -> dict:
+        """
+        :param row: the row of the NPC
+        :return: a dict containing all the NPC information, as given by NPCGenerator.generate
+        """
+        traits = {"name": self.name(row), "gender": self.gender(row)}
+        for key in NPC_SECTIONS:
+            traits[key] = self.trait(row, key)
+        return traits
+
+    def dicts(self) -> Iterator[dict]:
+        """
+        :return: the NPCs as dicts, i.e. for the export writers
+        """
+        return map(self.traits, range(len(self)))
+
+    def describe(self, row: int) -> str:
+        """
+        :param row: the row of the NPC
+        :return: the description of the NPC in a sentence
+        """
+        position = self.columns["accessories"][row]
+        determiner = self.renderer.forms["ACCESSORIES"].determiners[position] if position >= 0 else ""
+        return self.renderer.describe(self.traits(row), determiner)
+
+
+class NPC:
+    """
+    A NPC of a roster, read like the dict given by NPCGenerator.generate
+    """
+    __slots__ = ("roster", "row")
+
+    def __init__(self, roster: Roster, row: int):
+        self.roster = roster
+        self.row = row
+
+    def __getitem__(self, key: str) -> Optional[str]:
+        if key == "name":
+            return self.roster.name(self.row)
+        elif key == "gender":
+            return self.roster.gender(self.row)
+        return self.roster.trait(self.row, key)
+
+    def traits(self) -> dict:
+        return self.roster.traits(self.row)
+
+    def describe(self) -> str:
+        return self.roster.describe(self.row)
+
+    def __repr__(self):
+        return f"NPC({self.traits()!r})"
 
 
 class NPCGenerator:
@@ -10,122 +480,485 @@ class NPCGenerator:
     Generate a NPC given rules passed as tags
     """
 
-    def __init__(self, config):
+    def __init__(self, config, fallback: str = FALLBACK_RELAX, relax_order: Sequence[str] = (),
+                 stats_path: str = "stats.ini", cache_size: int = 256, name_registry: NameRegistry = None,
+                 index: TraitIndex = None, stats_table: "StatsTable" = None, instrumentation: Instrumentation = None,
+                 rng: random.Random = None, renderer: Renderer = None):
+        """
+        :param config: the config parser holding the traits, unused if index is given
+        :param fallback: what to do when no trait matches the tags, FALLBACK_RELAX drops the tags one by one until
+        something matches, FALLBACK_RAISE raises NoMatchingTrait and FALLBACK_NONE gives None instead of a trait
+        :param relax_order: the tags to drop first when relaxing, the other ones are dropped from the rarest to the
+        most common
+        :param stats_path: the path to the stats file, read again only when it changes
+        :param cache_size: the number of tag combinations whose candidates are kept
+        :param name_registry: the registry of the names already given, to never give the same name twice, names
+        may repeat if None
+        :param index: the compiled traits, i.e. loaded from a content pack, compiled from config if None
+        :param stats_table: the stats, read from stats_path if None
+        :param instrumentation: collects the retries and the time of each stage of the generations, nothing is
+        collected if None, it can be set or removed at any time
+        :param rng: the random generator of every draw, i.e. random.Random(seed) to generate the same NPCs again, the
+        global one of the random module if None. The generation methods also take one for a single call, i.e. the
+        threads of workers.make_executor each draw with their own, given by random_streams.spawn
+        :param renderer: the forms of the traits of index, i.e. loaded from a content pack with it, computed from the
+        index if None
+        """
+        if fallback not in FALLBACKS:
+            raise ValueError(f"Unknown fallback policy {fallback}, expected one of {sorted(FALLBACKS)}")
         self.config = config
-        self.traits, self.tags = self.get_config()
+        self.fallback = fallback
+        self.relax_order = tuple(relax_order)
+        # the compiled index, every lookup reads from it, the candidates of each tag combination it gives and the
+        # forms of its traits; they are kept together and replaced at once by reload so that a generation never mixes
+        # two versions
+        index = TraitIndex.from_config(config) if index is None else index
+        self.content = index, LRUCache(cache_size), Renderer(index) if renderer is None else renderer
+        self.stats_table = StatsTable(stats_path) if stats_table is None else stats_table
+        self.name_registry = name_registry
+        self.instrumentation = instrumentation
+        self.rng = random if rng is None else rng
+        self.reloads = 0
+        self.reload_time = 0.  # the number of seconds spent compiling the reloaded configs
+        self.last_reload_time = 0.
+
+    @classmethod
+    def from_pack(cls, pack, stats_path: str = "stats.ini", **kwargs) -> "NPCGenerator":
+        """
+        create a generator from a compiled content pack, without parsing the config files
+        :param pack: the content pack, see content_pack.load_pack
+        :param stats_path: the path to the stats file the pack was compiled from, read again if it changes
+        :param kwargs: the other arguments of the generator
+        :return: the generator
+        """
+        index = pack.index()
+        return cls(None, stats_path=stats_path, index=index, renderer=pack.renderer(index),
+                   stats_table=StatsTable(stats_path, pack.stats()), **kwargs)
+
+    @property
+    def index(self) -> TraitIndex:
+        return self.content[0]
+
+    @property
+    def pool_cache(self) -> LRUCache:
+        return self.content[1]
+
+    @property
+    def renderer(self) -> Renderer:
+        return self.content[2]
+
+    @property
+    def traits(self) -> Mapping[str, Sequence[str]]:
+        return self.index.traits
+
+    @property
+    def tags(self) -> Mapping[str, frozenset]:
+        return self.index.tags
 
     def get_config(self) -> Tuple[dict, dict]:
         """
-        get the global configuration from the config file
+        get the global configuration from the compiled index
         :return: a dict containing all the traits per categories and all the tags per trait
         """
-        traits = dict()
-        tags = dict()
-        for sec in self.config:  # for each section of the config file
-            traits[sec] = list()  # create a new list of traits
-            for el in self.config[sec]:  # for each element in the section
-                tags[el.upper()] = set()  # create a new set of tags
-                traits[sec].append(el)  # add the element to the list of trait
-                for tag in self.config[sec][el].split(','):  # for each tag of the trait
-                    tags[el.upper()].add(tag.strip())  # add the tag to the set
-        return traits, tags
+        index = self.index
+        return {sec: list(traits) for sec, traits in index.traits.items()}, index.tags
+
+    def stats(self) -> dict:
+        """
+        get a snapshot of the counters of the generator, the ones of the instrumentation are only there if it is set
+        :return: the counters of the candidate cache, the name registry, the reloads and the instrumentation
+        """
+        snapshot = {
+            "pool_cache": self.pool_cache.stats(), "stats_loads": self.stats_table.loads, "reloads": self.reloads,
+            "last_reload_time": self.last_reload_time
+        }
+        if self.name_registry is not None:
+            snapshot["names"] = self.name_registry.stats()
+        if self.instrumentation is not None:
+            snapshot.update(self.instrumentation.stats())
+        return snapshot
 
-    def generate(self, *tags) -> dict:
+    def generate(self, *tags, rng: random.Random = None) -> dict:
         """
         Generate a random NPC
         :param tags: the list of tags to rule the NPC tp create
+        :param rng: the random generator of this NPC, the one of the generator if None
         :return: a dict containing all the NPC information
         """
+        metrics = self.instrumentation
+        clock = metrics.clock() if metrics is not None else 0.
+        rng = self.rng if rng is None else rng
+        content = self.content  # the same version of the content for the whole NPC, even if it is reloaded meanwhile
         tags = set(tags)  # it is easier to work with sets
-        traits = dict()
         if not set(tags) & GENDERS:  # if no gender is requested
-            gender = self.get_gender(tags)  # select a gender at random
+            gender = self.get_gender(tags, rng)  # select a gender at random
         else:
-            gender = random.choice(list(tags & GENDERS))  # else pick a gender from the request tag
+            gender = rng.choice(sorted(tags & GENDERS))  # else pick a gender from the request tag
         tags -= GENDERS  # remove the genders from the tag set
         tags.add(gender)  # only add the selected gender
+        if metrics is not None:
+            clock = metrics.lap("generate: gender", clock)
 
-        name = create_name(random.randint(1, 3))  # create a random name with a random number of syllables
+        name = create_name(rng.randint(1, 3), rng)  # create a random name with a random number of syllables
+        if self.name_registry is not None:
+            name = self.name_registry.issue_many([name], lambda n: create_names(n, rng=rng))[0]
+        if metrics is not None:
+            clock = metrics.lap("generate: name", clock)
         if TITLE in tags:  # if a title is requested in the tags set
             tags -= {TITLE}  # remove it from the set
-            title = self.select_trait("TITLES", tags)  # select a random title given the tags
-            name = title.capitalize() + " " + name  # add it to the name
-            tags.add(title.lower())  # and add it to the tags, to avoid silly situations
-            # (i.e. a low rank job with high rank title or vice-versa)
-        specie, _ = self.get_gendered_trait(gender, "SPECIES", tags)
-
-        job, _ = self.get_gendered_trait(gender, "JOBS", tags)
-        appearance, _ = self.get_gendered_trait(gender, "APPEARANCES", tags)
-        behavior, behavior_key = self.get_gendered_trait(gender, "BEHAVIOR", tags)  # the appearance key is kept because
-        if ADJ in self.tags[behavior_key.upper()]:  # we need it in case of gendered traits
-            behavior = f"est {behavior}"
-        elif POSS in self.tags[behavior_key.upper()]:
-            if PLUR in self.tags[behavior_key.upper()]:
-                behavior = f"a de {behavior}"
-            else:
-                e_behavior = "e" if FEM in self.tags[behavior.upper()] else ""
-                behavior = f"a un{e_behavior} {behavior}"
-        personality, _ = self.get_gendered_trait(gender, "PERSONALITY", tags)
-
-        accessories = self.select_trait("ACCESSORIES", tags).lower()
-
-        traits["name"] = name
-        traits["gender"] = gender
-        traits["job"] = job
-        traits["specie"] = specie
-        traits["appearance"] = appearance
-        traits["behavior"] = behavior
-        traits["personality"] = personality
-        traits["accessories"] = accessories
+            title_pool = self.resolve_titles(tags, content)
+            title = title_pool.draw(rng)  # select a random title given the tags
+            self.count_outcome(title_pool.outcome)
+            if title is not None:
+                name = title.capitalize() + " " + name  # add it to the name
+                tags.add(title.lower())  # and add it to the tags, to avoid silly situations
+                # (i.e. a low rank job with high rank title or vice-versa)
+            if metrics is not None:
+                clock = metrics.lap("generate: title", clock)
+        pools = self.resolve_pools(tags, content)  # the candidates of every section, with their gendered form
+        if metrics is not None:
+            clock = metrics.lap("generate: pools", clock)
+        traits = {"name": name, "gender": gender}
+        for key, section_name in NPC_SECTIONS.items():
+            pool = pools[section_name]
+            traits[key] = pool.draw(rng)
+            self.count_outcome(pool.outcome)
+        if metrics is not None:
+            metrics.lap("generate: draw", clock)
         return traits
 
+    def generate_many(self, n: int, *tags, rng: random.Random = None) -> List[dict]:
+        """
+        Generate a crowd of random NPCs sharing the same tags. The traits each gender and title can take are resolved
+        once, then every NPC of the crowd is drawn from them
+        :param n: the number of NPCs to create
+        :param tags: the list of tags to rule the NPCs to create
+        :param rng: the random generator of this crowd, the one of the generator if None
+        :return: a list of dicts containing all the NPC information, like generate
+        """
+        metrics = self.instrumentation
+        clock = metrics.clock() if metrics is not None else 0.
+        rng = self.rng if rng is None else rng
+        content = self.content  # the same version of the content for the whole crowd
+        titles = content[0]["TITLES"].traits
+        keys = ("name", "gender", *NPC_SECTIONS)
+        npcs = list()
+        for gender, title, count, pools in self._groups(n, tags, content, rng):
+            columns = [pools[section_name].draw_many(count, rng) for section_name in NPC_SECTIONS.values()]
+            names = create_names(count, rng=rng)
+            if self.name_registry is not None:
+                names = self.name_registry.issue_many(names, lambda n: create_names(n, rng=rng))
+            if title is not None:
+                names = [titles[title].capitalize() + " " + name for name in names]
+            # the NPCs are zipped from the columns in C rather than filled key by key
+            npcs.extend(map(dict, map(zip, repeat(keys), zip(names, repeat(gender), *columns))))
+        rng.shuffle(npcs)  # the crowd was built group by group
+        if metrics is not None:
+            metrics.lap("generate_many", clock)
+            metrics.count("generated", n)
+        return npcs
+
+    def generate_roster(self, n: int, *tags, rng: random.Random = None) -> Roster:
+        """
+        Generate a crowd of random NPCs like generate_many, stored compactly in a roster
+        :param n: the number of NPCs to create
+        :param tags: the list of tags to rule the NPCs to create
+        :param rng: the random generator of this crowd, the one of the generator if None
+        :return: the roster of the NPCs
+        """
+        metrics = self.instrumentation
+        clock = metrics.clock() if metrics is not None else 0.
+        rng = self.rng if rng is None else rng
+        content = self.content  # the positions of the roster are only valid with the renderer of their index
+        roster = Roster(content[2])
+        for gender, title, count, pools in self._groups(n, tags, content, rng):
+            names = create_names(count, rng=rng)
+            if self.name_registry is not None:
+                names = self.name_registry.issue_many(names, lambda n: create_names(n, rng=rng))
+            roster.extend(gender, title, names, {
+                key: pools[section_name].draw_positions(count, rng) for key, section_name in NPC_SECTIONS.items()
+            })
+        roster.shuffle(rng)  # the crowd was built group by group
+        if metrics is not None:
+            metrics.lap("generate_roster", clock)
+            metrics.count("generated", n)
+        return roster
+
+    def _groups(self, n: int, tags: Iterable[str], content: tuple,
+                rng: random.Random) -> Iterator[Tuple[str, Optional[int], int, Dict[str, "CandidatePool"]]]:
+        """
+        split a crowd into the groups of NPCs sharing a gender and a title, whose candidates are resolved once
+        :param n: the number of NPCs of the crowd
+        :param tags: the tags to rule the NPCs, with the genders and the title request
+        :param content: the (index, cache, renderer) to resolve with
+        :param rng: the random generator of the crowd
+        :return: an iterator over the (gender, position of the title in TITLES or None, number of NPCs, candidates of
+        each section) of the groups, the fallback outcome of the candidates is counted for every NPC
+        """
+        titles = content[0]["TITLES"].traits
+        tags = set(tags)
+        genders = sorted(tags & GENDERS) or sorted(GENDERS)  # the genders are picked the same way as in generate
+        with_title = TITLE in tags
+        tags -= GENDERS | {TITLE}
+        for gender, gender_count in Counter(rng.choices(genders, k=n)).items():
+            gender_tags = tags | {gender}
+            group_titles = None
+            if with_title:
+                title_pool = self.resolve_titles(gender_tags, content)
+                group_titles = title_pool.draw_positions(gender_count, rng)
+                self.count_outcome(title_pool.outcome, gender_count)
+            for title, count in Counter(group_titles or [None] * gender_count).items():
+                group_tags = gender_tags if title is None else gender_tags | {titles[title].lower()}
+                pools = self.resolve_pools(group_tags, content)
+                for pool in pools.values():
+                    self.count_outcome(pool.outcome, count)
+                yield gender, title, count, pools
+
+    def stream(self, *tags, count: int = None, chunk_size: int = 1024, rng: random.Random = None) -> Iterator[dict]:
+        """
+        Generate NPCs lazily, a chunk at a time, so that only one chunk is held in memory whatever the count
+        :param tags: the list of tags to rule the NPCs to create
+        :param count: the number of NPCs to create, None to never stop
+        :param chunk_size: the number of NPCs generated together with generate_many
+        :param rng: the random generator of the stream, the one of the generator if None
+        :return: an iterator over dicts containing all the NPC information, like generate
+        """
+        remaining = count
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            yield from self.generate_many(size, *tags, rng=rng)
+            if remaining is not None:
+                remaining -= size
+
+    def resolve_pools(self, tags: Iterable[str], content: tuple = None) -> Dict[str, "CandidatePool"]:
+        """
+        get the candidates of every section for a tag combination, the result is kept in a LRU cache
+        :param tags: the tags to give the rules, holding the selected gender
+        :param content: the (index, cache, renderer) to resolve with, taken once by a generation so that a reload
+        does not mix two versions, the current one if None
+        :return: a dict giving the candidates of each section
+        """
+        index, pool_cache, renderer = self.content if content is None else content
+        key = self.pool_key(tags, index)
+        return pool_cache.get(key, lambda key: self._resolve_pools(key, index, renderer))
+
+    def resolve_titles(self, tags: Iterable[str], content: tuple = None) -> "CandidatePool":
+        """
+        get the titles a draw can give for a tag combination, only resolved when a title is requested so that the
+        fallback policy never applies to them otherwise, the result is kept in the LRU cache too
+        :param tags: the tags to give the rules, holding the selected gender
+        :param content: the (index, cache, renderer) to resolve with, the current one if None
+        :return: the candidate titles
+        """
+        index, pool_cache, _ = self.content if content is None else content
+        key = self.pool_key(tags, index)
+        return pool_cache.get((TITLE, key), lambda _: self._resolve_titles(key, index))
+
     @staticmethod
-    def get_gender(tags: set) -> str:
+    def pool_key(tags: Iterable[str], index: TraitIndex) -> frozenset:
+        """
+        :param tags: the requested tags
+        :param index: the index the candidates are resolved from
+        :return: the tags that can change the candidates: the ones of the vocabulary and the gender, which selects
+        the gendered forms even when no trait carries it as a tag
+        """
+        return frozenset(tag for tag in tags if tag in index.vocabulary or tag in GENDERS)
+
+    def _resolve_titles(self, tags: frozenset, index: TraitIndex) -> "CandidatePool":
+        section = index["TITLES"]
+        possible_traits, outcome = self._resolve(section, tags)
+        return CandidatePool(bit_positions(possible_traits), section.traits, section.weights, outcome)
+
+    def _resolve_pools(self, tags: frozenset, index: TraitIndex, renderer: Renderer) -> Dict[str, "CandidatePool"]:
+        """
+        get the candidates of every section for a tag combination, with the form they take in a NPC
+        :param tags: the tags to give the rules, holding the selected gender
+        :param index: the index to read the traits from
+        :param renderer: the forms of the traits of the index
+        :return: a dict giving the candidates of each section
+        """
+        gender = min(tags & GENDERS, default=None)
+        pools = dict()
+        for section_name in NPC_SECTIONS.values():
+            section = index[section_name]
+            if section_name == "ACCESSORIES":  # the accessories do not depend on the gender
+                possible_traits, outcome = self._resolve(section, tags)
+            else:
+                possible_traits, outcome = self._resolve(section, tags, self.gender_filter(section, gender))
+            section_forms = renderer.forms[section_name]
+            section_forms = section_forms.feminine if gender == WOM else section_forms.masculine
+            pools[section_name] = CandidatePool(bit_positions(possible_traits), section_forms, section.weights, outcome)
+        return pools
+
+    def reload(self, config) -> Tuple[str, ...]:
+        """
+        use a new config, only the sections that changed are compiled again and the cached candidates are dropped.
+        The new index is built aside then swapped in, each generation takes the content once so the ones running
+        meanwhile finish with the old one
+        :param config: the config parser holding the traits
+        :return: the names of the sections compiled again
+        """
+        start = time.perf_counter()
+        index = TraitIndex.from_config(config, previous=self.index)
+        self.content = index, LRUCache(self.pool_cache.size), Renderer(index, previous=self.renderer)
+        self.config = config
+        self.last_reload_time = time.perf_counter() - start
+        self.reload_time += self.last_reload_time
+        self.reloads += 1
+        return index.rebuilt
+
+    @staticmethod
+    def get_gender(tags: set, rng: random.Random = random) -> str:
         """
         chose a gender
         :param tags: the tag set to give rules
+        :param rng: the random generator to draw with, the global one of the random module by default
         :return: the selected gender
         """
         if GENDERS.issubset(tags):
-            return random.choice(list(GENDERS))
+            return rng.choice(GENDER_CODES)
         elif WOM in tags:
             return WOM
         elif MAN in tags:
             return MAN
         else:
-            return random.choice(list(GENDERS))
+            return rng.choice(GENDER_CODES)
 
-    def get_gendered_trait(self, gender: str, trait, tags) -> Tuple[str, str]:
+    def get_gendered_trait(self, gender: str, trait, tags) -> Tuple[Optional[str], Optional[str]]:
         """
         select a trait given a gender
         :param gender: the selected gender
         :param trait: the trait to choose from
         :param tags: the tags to give rule
-        :return: a tuple giving the gendered trait and its key to find its associated tags
+        :return: a tuple giving the gendered trait and its key to find its associated tags, (None, None) if nothing
+        matches and the fallback policy is FALLBACK_NONE
         """
+        section = self.index[trait]
+        position = self.draw(section, tags, self.gender_filter(section, gender))
+        if position is None:
+            return None, None
+        return self.gendered_form(section, position, gender), section.traits[position]
 
-        while True:
-            selected_trait = self.select_trait(trait, tags)  # we choose a trait
-            genders = GENDERS.intersection(self.tags[selected_trait.upper()])  # a get the gender of the trait
-            if not genders or gender in genders:  # if there is no preferred gender or its associated gender matches
-                if gender == WOM and GENDERED in self.tags[selected_trait.upper()]:  # if the gender needs adjustments
-                    return apply_gender(selected_trait), selected_trait  # add an e to the end
-                else:
-                    return selected_trait, selected_trait  # else give it as it is
-            else:  # if the preferred gendered does not match the trait's associated gender
-                if GENDERED in self.tags[selected_trait.upper()]:  # if the trait is gendered
-                    if gender == WOM:
-                        return apply_gender(selected_trait), selected_trait
-                    elif gender == MAN:
-                        return selected_trait, selected_trait  # if it is not, repeat until it is
+    def gendered_form(self, section: SectionIndex, position: int, gender: str) -> str:
+        """
+        give a trait in the form matching a gender
+        :param section: the section of the trait
+        :param position: the position of the trait in the section
+        :param gender: the selected gender
+        :return: the trait, with its feminine form if needed
+        """
+        selected_trait = section.traits[position]
+        if gender == WOM and GENDERED in section.tags[position]:  # if the gender needs adjustments
+            return self.renderer.genders.feminize(selected_trait)
+        return selected_trait  # else give it as it is
 
-    def _get_trait(self, trait) -> str:
+    def job_key(self, job: str) -> str:
         """
-        get a random item from the config file
-        :param trait: the section to pick from
-        :return: a random trait regardless the tags
+        :param job: the job of a NPC, in its gendered form
+        :return: the job as found in the stats file, to give to get_characteristics
         """
-        return random.choice(self.traits[trait])
+        return self.renderer.genders.masculinize(job, "JOBS")
+
+    @staticmethod
+    def gender_filter(section: SectionIndex, gender: str) -> int:
+        """
+        get the traits a gender can take: the ones without a gender, the ones of this gender and the gendered ones
+        :param section: the section to filter
+        :param gender: the selected gender
+        :return: the bitset of the allowed traits
+        """
+        columns = section.columns
+        with_gender = 0
+        for each_gender in GENDERS:
+            with_gender |= columns.get(each_gender, 0)
+        allowed = (section.full & ~with_gender) | columns.get(gender, 0)
+        if gender in GENDERS:
+            allowed |= columns.get(GENDERED, 0)
+        return allowed
+
+    def draw(self, section: SectionIndex, tags, allowed: int = None) -> Optional[int]:
+        """
+        draw a trait matching all the tags, with the weights of the traits, applying the fallback policy if there is
+        none
+        :param section: the section to pick from
+        :param tags: the tags to give the rules
+        :param allowed: a bitset restricting the traits that can be picked, every trait if None
+        :return: the position of the chosen trait, None if nothing matches and the fallback policy is FALLBACK_NONE
+        """
+        possible_traits = self.resolve(section, tags, allowed)
+        if not possible_traits:
+            return None
+        if section.weights is None:
+            return nth_bit(possible_traits, self.rng.randrange(popcount(possible_traits)))
+        if possible_traits == section.full:
+            return section.alias.draw(self.rng)
+        positions = bit_positions(possible_traits)  # a single draw, building an alias table would not pay off
+        return self.rng.choices(positions, [section.weights[p] for p in positions])[0]
+
+    def resolve(self, section: SectionIndex, tags, allowed: int = None) -> int:
+        """
+        get the traits a draw can pick from, applying the fallback policy if none matches all the tags
+        :param section: the section to pick from
+        :param tags: the tags to give the rules
+        :param allowed: a bitset restricting the traits that can be picked, every trait if None
+        :return: the bitset of the traits to pick from, 0 if nothing matches and the fallback policy is FALLBACK_NONE
+        """
+        possible_traits, outcome = self._resolve(section, tags, allowed)
+        self.count_outcome(outcome)
+        return possible_traits
+
+    def _resolve(self, section: SectionIndex, tags, allowed: int = None) -> Tuple[int, Tuple[Tuple[str, int], ...]]:
+        """
+        like resolve, but give the counters of the fallback policy rather than counting them, so that a cached pool
+        counts them on each of its draws
+        :param section: the section to pick from
+        :param tags: the tags to give the rules
+        :param allowed: a bitset restricting the traits that can be picked, every trait if None
+        :return: the bitset of the traits to pick from and the (counter, amount) pairs of the fallback policy
+        """
+        allowed = section.full if allowed is None else allowed
+        tags = section.relevant(tags)  # only keep the tags this section knows about
+        for dropped, relaxed_tags in enumerate(self._relaxations(section, tags)):
+            possible_traits = section.query(relaxed_tags) & allowed  # the bitset of the traits matching all the tags
+            if possible_traits:
+                if dropped:
+                    return possible_traits, ((f"relaxed {section.name}", 1), (f"tags dropped {section.name}", dropped))
+                return possible_traits, ()
+            if self.fallback != FALLBACK_RELAX:
+                break
+        else:
+            if section.full:  # nothing is allowed whatever the tags, the restriction is dropped too
+                return section.full, ((f"unrestricted {section.name}", 1),)
+        if self.fallback == FALLBACK_NONE:
+            return 0, ((f"no match {section.name}", 1),)
+        self.count_outcome(((f"no match {section.name}", 1),))
+        raise NoMatchingTrait(section.name, tags)
+
+    def count_outcome(self, outcome: Iterable[Tuple[str, int]], draws: int = 1):
+        """
+        count the fallback policy applied to get some candidates, if the generator is instrumented
+        :param outcome: the (counter, amount) pairs of the fallback policy
+        :param draws: the number of draws made from the candidates
+        """
+        metrics = self.instrumentation
+        if metrics is not None:
+            for counter, amount in outcome:
+                metrics.count(counter, amount * draws)
+
+    def _relaxations(self, section: SectionIndex, tags: frozenset) -> Iterator[frozenset]:
+        """
+        give the tags, then the tags with one less tag each time, in the relax order
+        :param section: the section the tags belong to
+        :param tags: the requested tags
+        :return: an iterator over the tag sets to try
+        """
+        yield tags
+        first = [tag for tag in self.relax_order if tag in tags]
+        then = sorted(tags.difference(first), key=lambda tag: (popcount(section.columns[tag]), tag))
+        remaining = set(tags)
+        for tag in first + then:
+            remaining.discard(tag)
+            yield frozenset(remaining)
 
     def get_tags(self, section) -> list:
         """
@@ -133,62 +966,35 @@ class NPCGenerator:
         :param section: the section to get the tags from
         :return: a list of sets of tags
         """
-        tags = list()
-        for traits in self.config[section]:
-            trait_set = set()
-            for t in self.config[section][traits].split(','):
-                trait_set.add(t.strip())
-            tags.append(trait_set)
-        return tags
+        return list(self.index[section].tags)
 
     def get_all_tags(self) -> list:
         """
         get all the tags used in the config file
         :return: a list of all the tags
         """
-        tags = list()
-        for sec in self.config:
-            for tag_list in list(self.get_tags(sec)):
-                for tag in tag_list:
-                    if tag not in tags:
-                        tags.append(tag)
-        return tags
+        tags = dict()
+        for sec in self.index:
+            tags.update(dict.fromkeys(self.index[sec].vocabulary))
+        return list(tags)
 
     def get_tags_per_section(self) -> dict:
         """
         get a dict of all the tags per section
         :return: a dict containing all the tags, each key is a section
         """
-        tags = dict()
-        for sec in self.config:
-            tags[sec] = list()
-            for tag_list in list(self.get_tags(sec)):
-                for tag in tag_list:
-                    if tag not in tags[sec]:
-                        tags[sec].append(tag)
-        return tags
+        return {sec: list(self.index[sec].vocabulary) for sec in self.index}
 
-    def select_trait(self, trait: str, tags: set) -> str:
+    def select_trait(self, trait: str, tags: set) -> Optional[str]:
         """
         select a trait at random given the tags
         :param trait: the trait to select
         :param tags: the tags to give the rules
-        :return: the chosen trait
-        """
-        tags = set(self.get_tags_per_section()[trait]) & tags
-        possible_traits = list()  # we create a list of possibilities
-        for each_trait in self.traits[trait]:  # for each trait in the config file
-            if tags.issubset(self.tags[each_trait.upper()]):
-                possible_traits.append(each_trait)  # add it to the list
-        if possible_traits:  # if there are at least one choice
-            selected_trait = random.choice(possible_traits)
-        else:
-            selected_trait = self._get_trait(trait)  # we select a random trait from the list
-        if not self.check_tag(trait, tags):  # if there is no perfect match
-            return selected_trait  # we return the selected trait
-        while not tags.issubset(set(self.tags[selected_trait.upper()])):  # If a perfect match exists
-            selected_trait = self._get_trait(trait)  # we pick another one to hope for something new
-        return selected_trait  # and we return a trait that ALL of the tags match
+        :return: the chosen trait, None if nothing matches and the fallback policy is FALLBACK_NONE
+        """
+        section = self.index[trait]
+        position = self.draw(section, tags)
+        return None if position is None else section.traits[position]
 
     def check_tag(self, section, tags) -> bool:
         """
@@ -197,11 +1003,10 @@ class NPCGenerator:
         :param tags: the set of tags
         :return: True if there is at least one perfect match, False else
         """
-        tags_list = self.get_tags(section)  # we get all the tags list for avery elements of this section
-        for tag in tags_list:  # for each tag list
-            if set(tags).issubset(tag):  # if there is at least one match
-                return True  # we say there is at least one
-        return False  # else we say there is no perfect match
+        section = self.index[section]
+        if not set(tags).issubset(section.columns):  # a tag unknown to the section can never be matched
+            return False
+        return bool(section.query(tags))
 
     def get_tag_list(self):
         working_tags = [MASC, FEM, PLUR, PLURS, ADJ, POSS, VERB, GENDERED, BEHAVE]
@@ -209,8 +1014,7 @@ class NPCGenerator:
             if tag not in working_tags:
                 yield tag
 
-    @staticmethod
-    def get_characteristics(game: str, specie: str, job_key: str) -> Tuple[
+    def get_characteristics(self, game: str, specie: str, job_key: str) -> Tuple[
         Union[int, str], Union[int, str], Union[int, str],
         Union[int, str], Union[int, str], Union[int, str]]:
         """
@@ -220,36 +1024,130 @@ class NPCGenerator:
         :param job_key: the job specified
         :return: an array of stats given the game
         """
-        stats = ConfigParser()
-        stats.read("stats.ini", "utf8")
-        if game == SW_TAG:
-            try:
-                vig_b, agi_b, int_b, rus_b, vol_b, pre_b = stats[game.upper()][specie].split(', ')
-                vig_m, agi_m, int_m, rus_m, vol_m, pre_m = stats[game.upper()].get(
-                    job_key, "0, 0, 0, 0, 0, 0").split(', ')
-                return get_char(game, int(vig_b) + int(vig_m)), get_char(game, int(agi_b) + int(agi_m)), \
-                       get_char(game, int(int_b) + int(int_m)), get_char(game, int(rus_b) + int(rus_m)), \
-                       get_char(game, int(vol_b) + int(vol_m)), get_char(game, int(pre_b) + int(pre_m))
-            except KeyError:
-                print(f"No stats for {specie} in game {game}")
-                return 0, 0, 0, 0, 0, 0
-        elif game == OGL_TAG:
+        if game not in (SW_TAG, OGL_TAG):
+            return None
+        stats = self.get_characteristics_many([(game, specie, job_key)])[0]
+        return format_characteristics(game, stats)
+
+    def get_characteristics_many(self, rows: Iterable[Tuple[str, str, str]]) -> List[Tuple[int, ...]]:
+        """
+        generate random characteristics for a whole crowd at once
+        :param rows: the game, specie and job of each NPC
+        :return: the 6 raw stats of each NPC, all 0 if the specie has no stats in the game, use
+        format_characteristics to display them
+        """
+        metrics = self.instrumentation
+        clock = metrics.clock() if metrics is not None else 0.
+        means = dict()  # the same (game, specie, job) are usually found many times in a crowd
+        missing = set()
+        rows_means = list()
+        for row in rows:
+            if row not in means:
+                game, specie, job_key = row
+                try:
+                    base = self.stats_table.get(game, specie)
+                    modifiers = self.stats_table.get(game, job_key, JOB_DEFAULT_STATS[game])
+                    means[row] = tuple(b + m for b, m in zip(base, modifiers)), 6 if game == SW_TAG else 20
+                except KeyError:
+                    means[row] = None
+                    if (game, specie) not in missing:
+                        missing.add((game, specie))
+                        print(f"No stats for {specie} in game {game}")
+            rows_means.append(means[row])
+        # every stat of the crowd is drawn in a single pass, then the same rule as get_char is applied:
+        # the mean replaces any stat out of bounds
+        flat_means = [mean for row_means in rows_means if row_means is not None for mean in row_means[0]]
+        flat_max = [row_means[1] for row_means in rows_means if row_means is not None for _ in range(6)]
+        offsets = self.rng.choices(GAUSS_OFFSETS, cum_weights=GAUSS_CUM_WEIGHTS, k=len(flat_means))
+        flat_stats = [
+            stat if 0 < stat <= max_stat else mean
+            for mean, max_stat, stat in zip(flat_means, flat_max, map(int.__add__, flat_means, offsets))
+        ]
+        characteristics = list()
+        drawn = iter(flat_stats)
+        for row_means in rows_means:
+            if row_means is None:
+                characteristics.append((0, 0, 0, 0, 0, 0))
+            else:
+                characteristics.append((next(drawn), next(drawn), next(drawn), next(drawn), next(drawn), next(drawn)))
+        if metrics is not None:
+            metrics.lap("characteristics", clock)
+            metrics.count("stats missing", len(characteristics) - len(flat_means) // 6)
+        return characteristics
+
+
+class StatsTable:
+    """
+    The stats file parsed into tuples of integers, parsed again only when the file changes on disk
+    """
+    _missing = object()
+
+    def __init__(self, path: str = "stats.ini", table: Dict[str, Dict[str, Sequence[int]]] = None):
+        """
+        :param path: the path to the stats file
+        :param table: the stats already loaded from the current version of the file, i.e. from a content pack
+        """
+        self.path = path
+        self.loads = 0  # the number of times the file was parsed
+        self._mtime = None
+        self._table = dict()
+        if table is not None:
+            self._table = table
             try:
-                for_b, agi_b, con_b, int_b, sag_b, cha_b = stats[game.upper()][specie].split(', ')
-                for_m, agi_m, con_m, int_m, sag_m, cha_m = stats[game.upper()].get(
-                    job_key, "10, 10, 10, 10, 10, 10").split(', ')
-                stat_for = get_char(game, int(for_b) + int(for_m))
-                stat_agi = get_char(game, int(agi_b) + int(agi_m))
-                stat_con = get_char(game, int(con_b) + int(con_m))
-                stat_int = get_char(game, int(int_b) + int(int_m))
-                stat_sag = get_char(game, int(sag_b) + int(sag_m))
-                stat_cha = get_char(game, int(cha_b) + int(cha_m))
-                return f"{stat_for} ({(stat_for - 10) >> 1:+d})", f"{stat_agi} ({(stat_agi - 10) >> 1:+d})", \
-                       f"{stat_con} ({(stat_con - 10) >> 1:+d})", f"{stat_int} ({(stat_int - 10) >> 1:+d})", \
-                       f"{stat_sag} ({(stat_sag - 10) >> 1:+d})", f"{stat_cha} ({(stat_cha - 10) >> 1:+d})"
-            except KeyError:
-                print(f"No stats for {specie} in game {game}")
-                return 0, 0, 0, 0, 0, 0
+                self._mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                pass
+
+    def table(self) -> Dict[str, Dict[str, Tuple[int, ...]]]:
+        """
+        get the stats of every game, reloading them if the file was modified since the last call
+        :return: a dict giving for each game (in upper case) the stats of every specie and job
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None  # as before, a missing file means no stats at all
+        if mtime != self._mtime:
+            self._table = self.load(self.path)
+            self._mtime = mtime
+            self.loads += 1
+        return self._table
+
+    @staticmethod
+    def load(path: str) -> Dict[str, Dict[str, Tuple[int, ...]]]:
+        """
+        parse the stats file, the rows that are not 6 integers are reported and skipped
+        :param path: the path to the stats file
+        :return: a dict giving for each game (in upper case) the stats of every specie and job
+        """
+        stats = ConfigParser()
+        stats.read(path, "utf8")
+        table = dict()
+        for sec in stats.sections():
+            table[sec.upper()] = dict()
+            for key, values in stats[sec].items():
+                try:
+                    row = tuple(int(value) for value in values.split(','))
+                except ValueError:
+                    row = ()
+                if len(row) != 6:  # one value per characteristic, the rolls of a crowd are read 6 by 6
+                    print(f"Invalid stats for {key} in game {sec}: {values}")
+                    continue
+                table[sec.upper()][key] = row
+        return table
+
+    def get(self, game: str, key: str, default=_missing) -> Tuple[int, ...]:
+        """
+        get the stats of a specie or a job
+        :param game: the game played
+        :param key: the specie or job, case insensitive like in the config file
+        :param default: what to return if the key has no stats, a KeyError is raised if not given
+        :return: the tuple of stats
+        """
+        stats = self.table()[game.upper()].get(key.lower(), default)
+        if stats is self._missing:
+            raise KeyError(key)
+        return stats
 
 
 def apply_gender(t) -> str:
@@ -273,193 +1171,271 @@ def apply_gender(t) -> str:
         return f"{t}e"
 
 
-def get_char(game: str, mean: int) -> int:
+def behavior_verb(behavior: str, tags: Iterable[str]) -> str:
+    """
+    add the verb introducing a behavior
+    :param behavior: the behavior, in its gendered form
+    :param tags: the tags of the behavior
+    :return: the behavior ready to be put in a sentence
+    """
+    if ADJ in tags:
+        return f"est {behavior}"
+    elif POSS in tags:
+        if PLUR in tags:
+            return f"a de {behavior}"
+        e_behavior = "e" if FEM in tags else ""
+        return f"a un{e_behavior} {behavior}"
+    return behavior
+
+
+def determiner(tags: Iterable[str]) -> str:
+    """
+    :param tags: the tags of a trait
+    :return: the indefinite determiner of the trait, "" if its tags do not give one
+    """
+    if FEM in tags:
+        return "une"
+    elif MASC in tags:
+        return "un"
+    elif PLUR in tags:
+        return "de"
+    elif PLURS in tags:
+        return "des"
+    return ""
+
+
+def format_characteristics(game: str, stats: Tuple[int, ...]) -> Tuple[Union[int, str], ...]:
+    """
+    give the stats the way they are displayed for a game, with their modifier for OGL
+    :param game: the game played
+    :param stats: the raw stats
+    :return: the stats to display
+    """
+    if game == OGL_TAG and any(stats):
+        return tuple(format_ogl(stat) for stat in stats)
+    return tuple(stats)
+
+
+def format_ogl(stat: int) -> str:
+    """
+    give an OGL stat with its modifier
+    :param stat: the raw stat
+    :return: the stat followed by its modifier, i.e. "14 (+2)"
+    """
+    return f"{stat} ({(stat - 10) >> 1:+d})"
+
+
+# round(gauss(mean, 2)) is mean plus a rounded gauss(0, 2) when the mean is an integer, the rounded offsets are
+# drawn from their exact distribution, cut at 10 standard deviations where the remaining probability is about 1e-23
+GAUSS_OFFSETS = tuple(range(-20, 21))
+GAUSS_CUM_WEIGHTS = tuple(NormalDist(0, 2).cdf(offset + 0.5) for offset in GAUSS_OFFSETS)
+
+
+def get_char(game: str, mean: int, rng: random.Random = random) -> int:
     """
     get a random characteristic around the mean using a gauss bell curve with std deviation = 2
     If the value is bellow 0 or above the max of the game, the mean is returned to skew more toward it
     :param game: the game played
     :param mean: the value to
+    :param rng: the random generator to draw with, the global one of the random module by default
     :return: mean +/- gauss(0, 2)
     """
     max_stat = 6 if game == SW_TAG else 20
-    stat = round(random.gauss(mean, 2))
+    stat = round(rng.gauss(mean, 2))
     return stat if 0 < stat <= max_stat else mean
 
 
-def create_name(length) -> str:
+CONSONANTS = (
+    "z", "zl", "r", "rh", "t", "tr", "th", "tl", "tw", "y", "yh", "p", "pr", "ph", "pl", "q", "qu", "qs", "qh",
+    "ql", "s", "sz", "st", "sp", "sq", "ss", "sf", "sh", "sk", "sm", "sw", "sc", "sv", "sb", "sn", "d", "dz", "dr",
+    "dh", "dl", "f", "fz", "fr", "ft", "fp", "fh", "fl", "g", "gz", "gr", "gu", "gh", "gl", "h", "j", "jz", "js",
+    "jh", "jl", "k", "kz", "kr", "ks", "kh", "kj", "kl", "kc", "l", "lh", "m", "mh", "mm", "mn", "w", "wz", "wr",
+    "wh", "x", "xh", "c", "cz", "cr", "ct", "cs", "ch", "ck", "cl", "cw", "cx", "cc", "cv", "cn", "v", "vz", "vr",
+    "vh", "vl", "b", "bz", "br", "bs", "bf", "bh", "bl", "bw", "bv", ""
+)
+VOWELS = (
+    "a", "aa", "ae", "aë", "au", "ai", "aï", "ao", "e", "ea", "ee", "eu", "ei", "eo", "y", "u", "ua", "ue", "uu",
+    "ui", "uo", "i", "ia", "ie", "ii", "io", "o", "oa", "oe", "oë", "ou", "oi", "oo"
+)
+SEPARATORS = ("", "'", "-", " ")
+NAME_LENGTHS = (1, 2, 3)
+# the tables below repeat their entries so that a uniform draw follows the rules of create_name:
+# every syllable is a consonant and a vowel, the first one is capitalized
+SYLLABLES = tuple(consonant + vowel for consonant in CONSONANTS for vowel in VOWELS)
+FIRST_SYLLABLES = tuple(syllable.capitalize() for syllable in SYLLABLES)
+# the next ones are preceded by a separator half of the time, the empty one being among them, and are capitalized
+# after a visible separator
+NEXT_SYLLABLES = SYLLABLES * 5 + tuple(
+    separator + syllable.capitalize() for separator in SEPARATORS[1:] for syllable in SYLLABLES
+)
+# and half of the names end with a consonant
+ENDINGS = CONSONANTS + ("",) * len(CONSONANTS)
+
+
+def create_name(length, rng: random.Random = random) -> str:
     """
     Generate a name given a length, with consonants + vowel n times with a 50% chance to add a consonant at the end
     :param length: the number of syllables wanted
+    :param rng: the random generator to draw with, the global one of the random module by default
     :return: a name randomised
     """
-    consonants = [
-        "z", "zl", "r", "rh", "t", "tr", "th", "tl", "tw", "y", "yh", "p", "pr", "ph", "pl", "q", "qu", "qs", "qh",
-        "ql", "s", "sz", "st", "sp", "sq", "ss", "sf", "sh", "sk", "sm", "sw", "sc", "sv", "sb", "sn", "d", "dz", "dr",
-        "dh", "dl", "f", "fz", "fr", "ft", "fp", "fh", "fl", "g", "gz", "gr", "gu", "gh", "gl", "h", "j", "jz", "js",
-        "jh", "jl", "k", "kz", "kr", "ks", "kh", "kj", "kl", "kc", "l", "lh", "m", "mh", "mm", "mn", "w", "wz", "wr",
-        "wh", "x", "xh", "c", "cz", "cr", "ct", "cs", "ch", "ck", "cl", "cw", "cx", "cc", "cv", "cn", "v", "vz", "vr",
-        "vh", "vl", "b", "bz", "br", "bs", "bf", "bh", "bl", "bw", "bv", ""
-    ]
-
-    vowels = [
-        "a", "aa", "ae", "aë", "au", "ai", "aï", "ao", "e", "ea", "ee", "eu", "ei", "eo", "y", "u", "ua", "ue", "uu",
-        "ui", "uo", "i", "ia", "ie", "ii", "io", "o", "oa", "oe", "oë", "ou", "oi", "oo"
-    ]
-    name = ""
-    for i in range(length):
-        seg = random.choice(consonants) + random.choice(vowels)
-        if not name or name[-1] in ["'", "-", " "]:
-            seg = seg.capitalize()
-        name += seg
-        if i + 1 < length and random.randint(0, 1):
-            name += random.choice(["", "'", "-", " "])
-    if random.randint(0, 1):
-        name += random.choice(consonants)
-    return name
-
-
-def generate_name(specie: str, gender: str) -> str:
-    action = [
-        "Appelle", "Arpente", "Bâtit", "Brise", "Broie", "Chante", "Cherche", "Guide", "Gratte", "Mange", "Marche",
-        "Massacre", "Parle", "Porte", "Prend", "Sent", "Suit", "Tranche", "Veille", "Voit"
-    ]
-    anatomie = [
-        "Aile", "Barbe", "Bras", "Chair", "Coeur", "Crâne", "Crête", "Croc", "Dent", "Dos", "Echine", "Fourrure",
-        "Griffe", "Mâchoire", "Main", "OEil", "Pied", "Poing", "Souffle", "Tête"
-    ]
-    creature = [
-        "Aigle", "Ange", "Belette", "Cerf", "Cheval", "Corbeau", "Corneille", "Diable", "Dragon", "Faucon", "Homme",
-        "Lion", "Loup", "Molosse", "Monstre", "Rat", "Requin", "Sanglier", "Serpent", "Tigre"
-    ]
-    elements = [
-        "Aube", "Ciel", "Colline", "Crépuscule", "Eclair", "Etoile", "Feu", "Flamme", "Givre", "Lune", "Mer",
-        "Montagne", "Nuage", "Pierre", "Pluie", "Soleil", "Tempête", "Terre", "Tonnerre", "Vent"
-    ]
-    gemmes = [
-        "Acier", "Adamantine", "Argent", "Bronze", "Cuivre", "Diamant", "Emeraude", "Etain", "Fer", "Foyer", "Gemme",
-        "Granite", "Jade", "Minerai", "Mithril", "Onyx", "Opale", "Or", "Rubis", "Saphir"
-    ]
-    nature = [
-        "Arbre", "Bosquet", "Branche", "Brindille", "Caverne", "Chêne", "Epine", "Feuille", "Fleur", "Forêt", "Herbe",
-        "Mousse", "Orme", "Pin", "Printemps", "Racine", "Rivière", "Saule", "Vallée", "Vigne"
-    ]
-    negatif = [
-        "Brisé", "Cendres", "Déchiqueté", "Fétide", "Fléau", "Flétir", "Gris", "Malédiction", "Miasmes", "Mort", "Noir",
-        "Nuit", "Ombre", "Os", "Rouge", "Sang", "Sombre", "Ténèbres", "Venin", "Vil"
-    ]
-    positif = [
-        "Ame", "Aube", "Bénédiction", "Blanc", "Bleu", "Courageux", "Eté", "Gloire", "Héros", "Jour", "Juste", "Loi",
-        "Lumière", "Printemps", "Pur", "Roi", "Soleil", "Vérité", "Vert", "Voeu"
-    ]
-    titre = [
-
-    ]
-    outils = [
-        "Arc", "Bâton", "Bouclier", "Couteau", "Dague", "Enclume", "Epée", "Flèche", "Forge", "Garde", "Hache",
-        "Harpon", "Lame", "Marteau", "Masse", "Pique", "Pointe", "Roue", "Scie"
-    ]
-    elfique_pref = [
-        "Aen", "Ala", "And", "Ar", "Cas", "Cyl", "El", "Eln", "Fir", "Gael", "Hu", "Koeh", "Laer", "Lue", "Nail", "Rhy",
-        "Sere", "Tia", "Tele", "Zau"
-    ]
-    elfique_suf = [
-        "ael", "ari", "eth", "dil", "eil", "evar", "ir", "mus", "oth", "rad", "re", "riel", "rond", "sar", "sil",
-        "tahl", "thus", "uil", "vain", "wyn"
-    ]
-    nain_m = [
-
-    ]
-    nain_f = [
-
-    ]
-    humain_m = [
-        "Aiden", "Bruce", "Dirk", "Gareth", "Gregor", "Gustave", "Haslten", "Harold", "Jacques", "Jean", "Kirk", "Lief",
-        "Liam", "Patrick", "Robert", "Ronan", "Seth", "Steven", "Tom", "William"
-    ]
-    humain_f = [
-        "Abby", "Bridget", "Cate", "Marguerite", "Hélène", "Hilda", "Ingrid", "Jessica", "Linnea", "Maggie", "Natalia",
-        "Olga", "Rebecca", "Raelia", "Rose", "Sarah", "Scarlett", "Sophia", "Tamara", "Violette"
-    ]
-    orque_pref = [
-
-    ]
-    orque_suf = [
-
-    ]
-    reptilien_pre = [
-        "Geth", "Grath", "Gyss", "Hyss", "Kla", "Lath", "Lex", "Lyth", "Mor", "Nar", "Nyl", "Pesh", "Ssath", "Sser",
-        "Ssla", "Tla", "Xer", "Xyl", "Xyss"
-    ]
-    reptilien_suf = [
-        "chal", "chyss", "geth", "hesh", "hyll", "kesh", "klatch", "lyss", "mash", "moth", "myss", "resh", "ron", "ryn",
-        "tetch", "tek", "thyss", "toss", "xec", "yss"
-    ]
-
-    article = "le"
-    if gender == 'f':
-        article = "la"
-
-    t = roll_d(20)
-    if specie == 'artificiel':
-        if 0 < t <= 4:
-            return select(elfique_pref + reptilien_pre) + select(elfique_suf + reptilien_suf)
-        elif 4 < t <= 10:
-            return f"{select(outils)} {select(positif)}"
-        elif 10 < t <= 15:
-            return f"{select(creature)} {select(negatif)} de {select(humain_m + humain_f)}"
-        elif 15 < t:
-            return f"{select(creature)} de {select(gemmes)} {roll_d(20)}.{roll_d(9)}"
-    elif specie == 'drake':
-        if 0 < t <= 6:
-            return f"{select(anatomie)} de {select(elements)}"
-        elif 6 < t <= 12:
-            return f"{select(anatomie)} {select(negatif)}"
-        elif 12 < t <= 18:
-            return f"{select(anatomie)} {select(positif)}"
-        elif 18 < t:
-            return f"{select(reptilien_pre)}{select(reptilien_suf)} {article} {select(action)}"
-    elif specie == 'elfe':
-        nom = f"{select(elfique_pref)}{select(elfique_suf)}"
-        if 0 < t <= 6:
-            return f"{nom} {select(creature)}-{select(gemmes)}"
-        elif 6 < t <= 12:
-            return f"{nom} {select(anatomie)} de {select(elements)}"
-        elif 12 < t <= 18:
-            return f"{nom} {select(action)} {select(nature)}"
-        elif 18 < t:
-            return f"{nom} {article} {select(outils)}-{select(positif)}"
-
-
-def roll_d(n: int) -> int:
-    return random.randint(1, n)
-
-
-def main():
+    # a single name is drawn syllable by syllable, create_names draws the syllables of many names together
+    choice = rng.choice
+    name = choice(FIRST_SYLLABLES) if length > 0 else ""
+    for _ in range(length - 1):
+        name += choice(NEXT_SYLLABLES)
+    return name + choice(ENDINGS)
+
+
+def create_names(n: int, length: int = None, rng: random.Random = random) -> List[str]:
+    """
+    Generate many names at once, the syllables of all the names of a given length are drawn together
+    :param n: the number of names
+    :param length: the number of syllables of each name, between 1 and 3 at random for each name if None
+    :param rng: the random generator to draw with, the global one of the random module by default
+    :return: the names, following the same rules as create_name
+    """
+    lengths = [length] * n if length is not None else rng.choices(NAME_LENGTHS, k=n)
+    names = dict()
+    for name_length in set(lengths):
+        count = lengths.count(name_length)
+        parts = [rng.choices(FIRST_SYLLABLES, k=count)] if name_length > 0 else []
+        for _ in range(name_length - 1):
+            parts.append(rng.choices(NEXT_SYLLABLES, k=count))
+        parts.append(rng.choices(ENDINGS, k=count))
+        # a name of several syllables is joined once rather than concatenated a syllable at a time
+        names[name_length] = map(add, *parts) if len(parts) == 2 else map("".join, zip(*parts))
+    return list(map(next, map(names.__getitem__, lengths)))  # each name takes the next one of its length
+
+
+class NameTable:
+    """
+    The naming rules of the species, compiled from the names file: for each specie, weighted patterns whose fields are
+    replaced by words of the word lists
+    """
+    FIELD = re.compile(r"{([^}]*)}")
+    DIE = re.compile(r"d(\d+)")
+
+    def __init__(self, config: ConfigParser):
+        """
+        :param config: the config parser holding the names file
+        """
+        words = {key: tuple(word.strip() for word in value.split(',')) for key, value in config["WORDS"].items()}
+        self.species = dict()
+        for sec in config.sections():
+            if sec == "WORDS":
+                continue
+            patterns = [self.compile(pattern, words) for pattern in config[sec]]
+            weights = AliasTable([float(weight) for weight in config[sec].values()])
+            self.species[sec.lower()] = patterns, weights
+
+    @classmethod
+    def compile(cls, pattern: str, words: Dict[str, Tuple[str, ...]]) -> list:
+        """
+        split a pattern into its literal text and its fields
+        :param pattern: the pattern, i.e. "{anatomie} de {elements}"
+        :param words: the word lists
+        :return: a list of strings, for the literal text, of tuples of words, for the fields to pick a word from, and
+        of ints, for the dice to roll, the article is kept as the string "{article}"
+        """
+        parts = list()
+        for i, part in enumerate(cls.FIELD.split(pattern)):
+            if i % 2 == 0:  # the text between two fields
+                if part:
+                    parts.append(part)
+            elif part == "article":
+                parts.append("{article}")
+            elif cls.DIE.fullmatch(part):
+                parts.append(int(part[1:]))
+            else:
+                parts.append(tuple(word for key in part.split('|') for word in words[key.strip()]))
+        return parts
+
+    def generate(self, specie: str, gender: str, rng: random.Random = random) -> Optional[str]:
+        """
+        generate a name following the rules of a specie
+        :param specie: the specie
+        :param gender: the gender of the NPC, to choose the article
+        :param rng: the random generator to draw with, the global one of the random module by default
+        :return: the name, None if the specie has no naming rules
+        """
+        if specie.lower() not in self.species:
+            return None
+        patterns, weights = self.species[specie.lower()]
+        article = "la" if gender in (WOM, 'f') else "le"
+        name = list()
+        for part in patterns[weights.draw(rng)]:
+            if isinstance(part, tuple):
+                name.append(rng.choice(part))
+            elif isinstance(part, int):
+                name.append(str(roll_d(part, rng)))
+            else:
+                name.append(article if part == "{article}" else part)
+        return "".join(name)
+
+
+_name_tables: Dict[str, NameTable] = dict()  # by path, each names file is read on the first call to generate_name
+_name_tables_lock = threading.Lock()  # generate_name is called from the worker threads
+
+
+def load_name_table(names_path: str = "names.ini") -> NameTable:
+    """
+    get the naming rules of a names file, it is only read once whatever the number of threads asking for it
+    :param names_path: the path to the names file
+    :return: the naming rules
+    """
+    with _name_tables_lock:
+        name_table = _name_tables.get(names_path)
+        if name_table is None:
+            names = ConfigParser()
+            names.optionxform = str  # the patterns are the keys, their literal text keeps its case
+            names.read(names_path, "utf8")
+            name_table = _name_tables[names_path] = NameTable(names)
+    return name_table
+
+
+def generate_name(specie: str, gender: str, names_path: str = "names.ini", rng: random.Random = random) -> str:
+    """
+    generate a name fitting a specie, following the rules of the names file
+    :param specie: the specie
+    :param gender: the gender of the NPC
+    :param names_path: the path to the names file, only read on the first call with this path
+    :param rng: the random generator to draw with, the global one of the random module by default
+    :return: the name, a random name as given by create_name if the specie has no naming rules
+    """
+    name = load_name_table(names_path).generate(specie, gender, rng)
+    return create_name(rng.randint(1, 3), rng) if name is None else name
+
+
+def roll_d(n: int, rng: random.Random = random) -> int:
+    return rng.randint(1, n)
+
+
+def main(argv: Sequence[str] = None):
+    parser = ArgumentParser(description="Generate a random NPC")
+    commands = parser.add_subparsers(dest="command")
+    bench = commands.add_parser("bench", help="measure the generator, see benchmarks/suite.py")
+    bench.add_argument("--sizes", type=int, nargs="*", default=None, help="traits of each synthetic content")
+    bench.add_argument("--vocabulary", type=int, default=32, help="free tags of the synthetic contents")
+    bench.add_argument("--density", type=float, default=0.1, help="probability of a trait to carry each free tag")
+    bench.add_argument("--duration", type=float, default=1.0, help="seconds spent on each benchmark")
+    bench.add_argument("--only", nargs="*", default=(), help="the benchmarks to run, i.e. generate_many")
+    bench.add_argument("--output", help="the JSON file to save the results to")
+    bench.add_argument("--compare", help="the JSON file of a previous run to compare with")
+    bench.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.command == "bench":
+        from benchmarks.suite import SIZES, run  # the suite imports this module
+        run(SIZES if args.sizes is None else args.sizes, args.vocabulary, args.density, args.duration, args.only,
+            args.output, args.compare, args.seed)
+        return
     npc = ConfigParser()
     npc.read("npc.ini", "utf8")
     npc_generator = NPCGenerator(npc)
     traits = npc_generator.generate()
-    if traits['gender'] == WOM:
-        e_gender = 'e'
-    else:
-        e_gender = ""
-    if FEM in npc_generator.tags[traits['accessories'].upper()]:
-        det_accessories = "une"
-    elif MASC in npc_generator.tags[traits['accessories'].upper()]:
-        det_accessories = "un"
-    elif PLUR in npc_generator.tags[traits['accessories'].upper()]:
-        det_accessories = "de"
-    elif PLURS in npc_generator.tags[traits['accessories'].upper()]:
-        det_accessories = "des"
-    else:
-        det_accessories = ""
-    npc_description = f"{traits['name']} est un{e_gender} {traits['job']} {traits['specie']} plutôt " \
-                      f"{traits['appearance']}, {traits['behavior']}, semble être {traits['personality']} et " \
-                      f"a {det_accessories} {traits['accessories']}"
+    npc_description = npc_generator.renderer.describe(traits)
     print(npc_description)
-    job_key = traits["job"] if traits['gender'] == MAN and GENDERED in npc_generator.tags[traits["job"].upper()] \
-        else apply_gender(traits["job"])
-    print(npc_generator.get_characteristics('sw', traits['specie'], job_key))
+    print(npc_generator.get_characteristics('sw', traits['specie'], npc_generator.job_key(traits["job"])))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,130 @@
+import os
+import threading
+from typing import Callable, List, Optional
+
+ROMAN_NUMERALS = (
+    (1000, "M"), (900, "CM"), (500, "D"), (400, "CD"), (100, "C"), (90, "XC"),
+    (50, "L"), (40, "XL"), (10, "X"), (9, "IX"), (5, "V"), (4, "IV"), (1, "I")
+)
+
+
+class NameRegistry:
+    """
+    Remember every name already given so that no two NPCs get the same one. A name already taken is drawn again a few
+    times, then a roman numeral is added after it (i.e. "Kleo II")
+    """
+
+    def __init__(self, path: Optional[str] = None, max_retries: int = 8):
+        """
+        :param path: the file keeping the names between sessions, one per line, nothing is kept if None
+        :param max_retries: the number of times a name already taken is drawn again before adding a numeral
+        """
+        self.path = path
+        self.max_retries = max_retries
+        self.names = set()
+        self.unsaved = list()
+        self.lock = threading.Lock()
+        self.issued = 0
+        self.collided = 0  # the names whose first draw was already taken
+        self.retries = 0  # the names drawn again
+        self.suffixed = 0
+        if path is not None and os.path.exists(path):
+            with open(path, encoding="utf8") as file:
+                self.names.update(line.rstrip("\n") for line in file if line.strip())
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __len__(self):
+        return len(self.names)
+
+    def issue(self, draw: Callable[[], str]) -> str:
+        """
+        draw a name nobody has yet and remember it
+        :param draw: the function drawing a random name
+        :return: the new name
+        """
+        return self.issue_many([draw()], lambda n: [draw() for _ in range(n)])[0]
+
+    def issue_many(self, names: List[str], draw_many: Callable[[int], List[str]]) -> List[str]:
+        """
+        make a list of names unique and remember them, the ones already taken are drawn again together
+        :param names: the names drawn
+        :param draw_many: the function drawing n random names, to replace the ones already taken
+        :return: the new names, in the same order
+        """
+        names = list(names)
+        with self.lock:
+            taken = self._take(names, range(len(names)))
+            self.collided += len(taken)
+            for _ in range(self.max_retries):
+                if not taken:
+                    break
+                self.retries += len(taken)
+                for position, name in zip(taken, draw_many(len(taken))):
+                    names[position] = name
+                taken = self._take(names, taken)
+            for position in taken:  # drawing again did not help, a numeral is added
+                names[position] = self._suffix(names[position])
+                self.suffixed += 1
+            self.issued += len(names)
+            if self.path is not None:
+                self.unsaved.extend(names)
+        return names
+
+    def _take(self, names: List[str], positions) -> List[int]:
+        """
+        remember the names that are still free
+        :param names: the names drawn
+        :param positions: the positions of the names to check
+        :return: the positions of the names that were already taken
+        """
+        taken = list()
+        for position in positions:
+            if names[position] in self.names:
+                taken.append(position)
+            else:
+                self.names.add(names[position])
+        return taken
+
+    def _suffix(self, name: str) -> str:
+        number = 2
+        while f"{name} {roman(number)}" in self.names:
+            number += 1
+        name = f"{name} {roman(number)}"
+        self.names.add(name)
+        return name
+
+    def save(self):
+        """
+        add the names given since the last save to the file
+        """
+        if self.path is None:
+            return
+        with self.lock:
+            with open(self.path, "a", encoding="utf8") as file:
+                file.writelines(name + "\n" for name in self.unsaved)
+            self.unsaved.clear()
+
+    def stats(self) -> dict:
+        """
+        :return: the counters of the registry, the collision rate and the retry cost are per issued name
+        """
+        return {
+            "names": len(self.names), "issued": self.issued, "collided": self.collided, "retries": self.retries,
+            "suffixed": self.suffixed, "collision_rate": self.collided / self.issued if self.issued else 0.,
+            "retries_per_name": self.retries / self.issued if self.issued else 0.
+        }
+
+
+def roman(number: int) -> str:
+    """
+    :param number: a positive integer
+    :return: the number written in roman numerals
+    """
+    digits = ""
+    for value, numeral in ROMAN_NUMERALS:
+        while number >= value:
+            digits += numeral
+            number -= value
+    return digits
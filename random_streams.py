@@ -0,0 +1,26 @@
+import hashlib
+import random
+from typing import List
+
+
+def stream_seed(seed: int, *key) -> int:
+    """
+    derive the seed of an independent random stream from a root seed, in the spirit of numpy's SeedSequence.spawn:
+    the root seed and the key are hashed together, so the same pair always gives the same stream and two keys give
+    unrelated ones, even for consecutive keys or root seeds
+    :param seed: the root seed
+    :param key: what tells the streams apart, i.e. the number of a worker or of a chunk
+    :return: a 256 bits seed for random.Random
+    """
+    digest = hashlib.sha256(repr((seed,) + key).encode("utf8")).digest()
+    return int.from_bytes(digest, "little")
+
+
+def spawn(seed: int, count: int) -> List[random.Random]:
+    """
+    create independent random generators, one per worker, none of them shares a state or a lock with another
+    :param seed: the root seed
+    :param count: the number of generators
+    :return: the generators, the same seed always gives the same ones
+    """
+    return [random.Random(stream_seed(seed, i)) for i in range(count)]
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from configparser import ConfigParser
+from typing import Callable, Dict, List, Optional
+
+from manager import NPCGenerator
+
+
+class ContentWatcher:
+    """
+    Poll the content files and call a function whenever one of them changes on disk. The polling is cheap (one stat per
+    file) and is done at most once per interval, either by calling check from an existing loop (Qt timer, asyncio task,
+    worker job) or from a background thread with start
+    """
+
+    def __init__(self, interval: float = 1.):
+        """
+        :param interval: the minimum number of seconds between two checks of the files
+        """
+        self.interval = interval
+        self.callbacks: Dict[str, Callable[[str], None]] = dict()
+        self.mtimes: Dict[str, Optional[int]] = dict()
+        self.lock = threading.Lock()
+        self.last_check = 0.
+        self.reloads = 0
+        self.errors = 0
+        self.reload_time = 0.  # the number of seconds spent in the callbacks
+        self.last_reload_time = 0.
+        self._thread = None
+        self._stop = threading.Event()
+
+    def watch(self, path: str, callback: Callable[[str], None]):
+        """
+        call a function whenever a file changes, the current version of the file is taken as already loaded
+        :param path: the path to the file
+        :param callback: the function loading the file, it gets the path
+        """
+        with self.lock:
+            self.callbacks[path] = callback
+            self.mtimes[path] = self.mtime(path)
+
+    @staticmethod
+    def mtime(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None  # a missing file is a change too when it comes back
+
+    def check(self, force: bool = False) -> List[str]:
+        """
+        reload the files modified since the last check, if the interval has passed
+        :param force: check even if the interval has not passed, and wait for a check running in another thread
+        instead of skipping it, so that the files are up to date when it returns
+        :return: the paths of the files reloaded
+        """
+        now = time.monotonic()
+        if not force and now - self.last_check < self.interval:
+            return []
+        if not self.lock.acquire(blocking=force):
+            return []  # another thread is already checking
+        try:
+            self.last_check = now
+            changed = list()
+            for path, callback in self.callbacks.items():
+                mtime = self.mtime(path)
+                if mtime == self.mtimes[path]:
+                    continue
+                self.mtimes[path] = mtime
+                start = time.perf_counter()
+                try:
+                    callback(path)
+                except Exception as error:  # a file saved in the middle of an edit must not stop the generator
+                    self.errors += 1
+                    print(f"Could not reload {path}: {error}")
+                    continue
+                self.last_reload_time = time.perf_counter() - start
+                self.reload_time += self.last_reload_time
+                self.reloads += 1
+                changed.append(path)
+            return changed
+        finally:
+            self.lock.release()
+
+    def start(self):
+        """
+        check the files from a background thread, until stop is called
+        """
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="content-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check(force=True)
+
+    def stats(self) -> dict:
+        """
+        :return: the counters of the watcher, the times are in seconds
+        """
+        return {
+            "files": len(self.callbacks), "reloads": self.reloads, "errors": self.errors,
+            "last_reload_time": self.last_reload_time,
+            "mean_reload_time": self.reload_time / self.reloads if self.reloads else 0.
+        }
+
+
+def reload_generator(generator: NPCGenerator) -> Callable[[str], None]:
+    """
+    :param generator: the generator to keep up to date
+    :return: a callback for ContentWatcher.watch, reading the traits file again and giving it to the generator, only
+    the sections that changed are compiled again
+    """
+    def reload(path: str):
+        config = ConfigParser()
+        with open(path, encoding="utf8") as file:  # unlike ConfigParser.read, a missing file is an error
+            config.read_file(file)
+        rebuilt = generator.reload(config)
+        print(f"Reloaded {path} in {generator.last_reload_time * 1000:.1f} ms, "
+              f"sections compiled again: {', '.join(rebuilt) or 'none'}")
+    return reload
+
+
+def watch_generator(watcher: ContentWatcher, generator: NPCGenerator, npc_path: str = "npc.ini"):
+    """
+    keep a generator up to date with its files, the stats file is also loaded as soon as it changes instead of at
+    the next generation needing it
+    :param watcher: the watcher polling the files
+    :param generator: the generator to keep up to date
+    :param npc_path: the path to the traits file
+    """
+    watcher.watch(npc_path, reload_generator(generator))
+    watcher.watch(generator.stats_table.path, lambda path: generator.stats_table.table())
@@ -0,0 +1,76 @@
+"""
+Check the counters of the NPC buffer, whose NPCs are generated by a thread pool and sent to a stub command context.
+Run from the root of the repository: python -m unittest discover tests
+"""
+import asyncio
+import os
+import unittest
+
+from test_workers import StubContext
+from workers import GenerationPool, NPCBuffer, make_executor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class NPCBufferTest(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = make_executor("thread", 2, os.path.join(ROOT, "npc.ini"), os.path.join(ROOT, "stats.ini"))
+        self.pool = GenerationPool(self.executor)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    async def refilled(self, buffer: NPCBuffer):
+        while buffer.refilling:
+            await asyncio.gather(*buffer.refilling.values())
+
+    def test_hits(self):
+        buffer = NPCBuffer(self.pool, size=4, low_water=1, warm=(), content_paths=())
+
+        async def run():
+            ctx = StubContext()
+            await buffer.reply(ctx, "sw")  # nothing buffered yet, generated on the spot
+            await self.refilled(buffer)
+            await buffer.reply(ctx, "sw")
+            await buffer.reply(ctx, "sw", "")  # the same tag combination
+            return ctx.messages
+
+        messages = asyncio.run(run())
+        self.assertEqual(len(messages), 3)
+        self.assertTrue(all(messages))
+        stats = buffer.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+        self.assertEqual(stats["buffered"], 2)
+
+    def test_evictions(self):
+        buffer = NPCBuffer(self.pool, size=2, low_water=1, max_tag_sets=2, warm=(), content_paths=())
+
+        async def run():
+            for tags in (("sw",), ("ogl",), ("sw", "w"), ("sw",)):
+                await buffer.get(*tags)
+                await self.refilled(buffer)
+
+        asyncio.run(run())
+        stats = buffer.stats()
+        self.assertEqual(stats["evictions"], 2)  # ("sw",) then ("ogl",) were dropped
+        self.assertEqual(stats["tag_sets"], 2)
+        self.assertEqual(stats["misses"], 4)
+        self.assertEqual(list(buffer.buffers), [("sw", "w"), ("sw",)])
+
+    def test_clear(self):
+        buffer = NPCBuffer(self.pool, size=2, low_water=1, warm=(), content_paths=())
+
+        async def run():
+            await buffer.get("sw")
+            await self.refilled(buffer)
+            buffer.clear()
+            await buffer.get("sw")
+
+        asyncio.run(run())
+        stats = buffer.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["flushes"]), (0, 2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
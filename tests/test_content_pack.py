@@ -0,0 +1,64 @@
+"""
+Check that a generator loaded from a compiled content pack draws the same NPCs as one built from the config files.
+Run from the root of the repository: python -m unittest discover tests
+"""
+from configparser import ConfigParser
+import os
+import random
+import tempfile
+import unittest
+
+from content_pack import ContentPack, compile_pack, load_pack
+from manager import NPCGenerator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NPC_PATH = os.path.join(ROOT, "npc.ini")
+STATS_PATH = os.path.join(ROOT, "stats.ini")
+
+
+class ContentPackTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.pack_path = os.path.join(directory.name, "content.pack")
+        compile_pack(self.pack_path, NPC_PATH, STATS_PATH)
+        self.pack = ContentPack(self.pack_path)
+        config = ConfigParser()
+        config.read(NPC_PATH, "utf8")
+        self.ini_generator = NPCGenerator(config, stats_path=STATS_PATH, rng=random.Random(42))
+        self.pack_generator = NPCGenerator.from_pack(self.pack, stats_path=STATS_PATH, rng=random.Random(42))
+
+    def tearDown(self):
+        del self.pack_generator  # its tables are views of the mapping
+        self.pack.close()
+
+    def generate(self, generator: NPCGenerator) -> list:
+        npcs = [generator.generate("sw", "title") for _ in range(50)]
+        npcs += generator.generate_many(200, "fantasy", "w")
+        npcs += generator.generate_roster(200, "sw", "ogl", "title").dicts()
+        return npcs
+
+    def test_same_npcs(self):
+        self.assertEqual(self.generate(self.pack_generator), self.generate(self.ini_generator))
+
+    def test_same_descriptions(self):
+        ini_roster = self.ini_generator.generate_roster(100, "sw")
+        pack_roster = self.pack_generator.generate_roster(100, "sw")
+        self.assertEqual([npc.describe() for npc in pack_roster], [npc.describe() for npc in ini_roster])
+
+    def test_same_stats(self):
+        table = {game: {specie: tuple(stats) for specie, stats in species.items()}
+                 for game, species in self.pack_generator.stats_table.table().items()}
+        self.assertEqual(table, self.ini_generator.stats_table.table())
+
+    def test_fresh(self):
+        self.assertTrue(self.pack.fresh(NPC_PATH, STATS_PATH))
+        self.assertFalse(self.pack.fresh(NPC_PATH, NPC_PATH))
+        compiled = os.stat(self.pack_path).st_mtime_ns
+        load_pack(self.pack_path, NPC_PATH, STATS_PATH).close()  # fresh, so it is opened as it is
+        self.assertEqual(os.stat(self.pack_path).st_mtime_ns, compiled)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+"""
+Check the generator on the shipped content: the gendered forms, the stats and the draws with a seeded random generator.
+Run from the root of the repository: python -m unittest discover tests
+"""
+from configparser import ConfigParser
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import io
+import os
+import random
+import tempfile
+import unittest
+
+from alias import AliasTable
+from constant_strings import FALLBACK_NONE, FALLBACK_RAISE, FALLBACK_RELAX
+from instrumentation import Instrumentation
+from manager import NPCGenerator, NoMatchingTrait, generate_name, load_name_table
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# no job nor specie is both sw and fantasy, so asking for both makes the generator apply its fallback policy
+SMALL_CONFIG = """
+[TITLES]
+Dr=sw, fantasy, m, w, dr
+[JOBS]
+pilote=sw, m, w, gendered
+marchand=fantasy, m, w, weight=3
+[SPECIES]
+bith=sw, m, w
+elfe=fantasy, m, w
+[APPEARANCES]
+maigre=m, w
+[BEHAVIOR]
+bégaie=sw, fantasy, voice, verb, m, w
+[PERSONALITY]
+agréable=m, w
+[ACCESSORIES]
+amulette=sw, fantasy, wear, fem, m, w
+"""
+
+
+def shipped_config() -> ConfigParser:
+    config = ConfigParser()
+    config.read(os.path.join(ROOT, "npc.ini"), "utf8")
+    return config
+
+
+def small_config() -> ConfigParser:
+    config = ConfigParser()
+    config.read_string(SMALL_CONFIG)
+    return config
+
+
+class GenderTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.generator = NPCGenerator(shipped_config(), stats_path=os.path.join(ROOT, "stats.ini"))
+
+    def test_job_key(self):
+        genders = self.generator.renderer.genders
+        for job in self.generator.index["JOBS"].traits:
+            self.assertEqual(self.generator.job_key(genders.feminize(job)), job)
+
+    def test_shared_feminine_form(self):
+        # soigneur (JOBS) and soigneux (PERSONALITY) are both soigneuse
+        genders = self.generator.renderer.genders
+        self.assertEqual(genders.feminize("soigneur"), genders.feminize("soigneux"))
+        self.assertEqual(self.generator.job_key("soigneuse"), "soigneur")
+        self.assertEqual(genders.masculinize("soigneuse", "PERSONALITY"), "soigneux")
+
+
+class StatsTableTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.stats_path = os.path.join(directory.name, "stats.ini")
+        with open(self.stats_path, "w", encoding="utf8") as file:
+            file.write("[SW]\nhumain=1, 1, 1, 1, 1\nbith=1, 2, 2, 2, 2, 3\nrodien=1, 2, x, 2, 2, 3\n")
+
+    def test_invalid_rows_skipped(self):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            generator = NPCGenerator(shipped_config(), stats_path=self.stats_path)
+            self.assertEqual(set(generator.stats_table.table()["SW"]), {"bith"})
+        self.assertIn("humain", output.getvalue())
+        self.assertIn("rodien", output.getvalue())
+
+    def test_rows_stay_aligned(self):
+        generator = NPCGenerator(shipped_config(), stats_path=self.stats_path)
+        rows = [("sw", "humain", "pilote"), ("sw", "bith", "pilote")] * 50
+        with contextlib.redirect_stdout(io.StringIO()):
+            characteristics = generator.get_characteristics_many(rows)
+            self.assertEqual(generator.get_characteristics("sw", "humain", "pilote"), (0, 0, 0, 0, 0, 0))
+        self.assertEqual(len(characteristics), 100)
+        self.assertEqual(characteristics[0::2], [(0, 0, 0, 0, 0, 0)] * 50)
+        self.assertTrue(all(len(stats) == 6 and all(0 < stat <= 6 for stat in stats)
+                            for stats in characteristics[1::2]))
+
+
+class SamplerTest(unittest.TestCase):
+
+    def generator(self, fallback: str = FALLBACK_RELAX, relax_order=(), seed: int = 7) -> NPCGenerator:
+        return NPCGenerator(small_config(), fallback=fallback, relax_order=relax_order,
+                            stats_path=os.path.join(ROOT, "stats.ini"), rng=random.Random(seed))
+
+    def test_relax(self):
+        self.assertEqual(self.generator(relax_order=("sw",)).generate("sw", "fantasy", "m")["job"], "marchand")
+        self.assertEqual(self.generator(relax_order=("fantasy",)).generate("sw", "fantasy", "m")["job"], "pilote")
+        crowd = self.generator().generate_many(50, "sw", "fantasy")
+        self.assertTrue(all(npc["job"] and npc["specie"] for npc in crowd))
+
+    def test_raise(self):
+        generator = self.generator(FALLBACK_RAISE)
+        with self.assertRaises(NoMatchingTrait) as raised:
+            generator.generate("sw", "fantasy", "w")
+        self.assertEqual((raised.exception.section, raised.exception.tags), ("JOBS", {"sw", "fantasy", "w"}))
+        self.assertRaises(NoMatchingTrait, generator.generate_many, 10, "sw", "fantasy")
+        self.assertEqual(generator.generate("sw", "m")["job"], "pilote")
+
+    def test_none(self):
+        generator = self.generator(FALLBACK_NONE)
+        for npc in [generator.generate("sw", "fantasy")] + generator.generate_many(20, "sw", "fantasy"):
+            self.assertEqual((npc["job"], npc["specie"]), (None, None))
+            self.assertEqual((npc["behavior"], npc["accessories"]), ("bégaie", "amulette"))
+        roster = generator.generate_roster(20, "sw", "fantasy")
+        self.assertTrue(all(npc["job"] is None for npc in roster))
+
+    def test_seeded(self):
+        self.assertEqual(self.generator(seed=3).generate_many(100, "m"), self.generator(seed=3).generate_many(100, "m"))
+        self.assertEqual([self.generator(seed=3).generate("m") for _ in range(10)],
+                         [self.generator(seed=3).generate("m") for _ in range(10)])
+
+    def test_weighted_draws(self):
+        # marchand has a weight of 3 against 1 for pilote
+        crowd = self.generator(seed=11).generate_many(4000, "m")
+        self.assertAlmostEqual(sum(npc["job"] == "marchand" for npc in crowd) / len(crowd), .75, delta=.03)
+        generator = self.generator(seed=11)
+        jobs = [generator.generate("m")["job"] for _ in range(4000)]
+        self.assertAlmostEqual(jobs.count("marchand") / len(jobs), .75, delta=.03)
+
+    def test_alias_table(self):
+        table = AliasTable([1, 2, 7])
+        rng = random.Random(5)
+        draws = table.draw_many(10000, rng) + [table.draw(rng) for _ in range(10000)]
+        for index, share in enumerate((.1, .2, .7)):
+            self.assertAlmostEqual(draws.count(index) / len(draws), share, delta=.02)
+        self.assertRaises(ValueError, AliasTable, [])
+
+
+class NameTableTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.paths = list()
+        for word in ("Aube", "Givre"):
+            path = os.path.join(directory.name, f"{word}.ini")
+            with open(path, "w", encoding="utf8") as file:
+                file.write(f"[WORDS]\nelements={word}\n[DRAKE]\n{{article}} {{elements}}=1\n")
+            self.paths.append(path)
+
+    def test_per_path(self):
+        rng = random.Random(1)
+        self.assertEqual(generate_name("drake", "w", self.paths[0], rng), "la Aube")
+        self.assertEqual(generate_name("drake", "m", self.paths[1], rng), "le Givre")
+        self.assertIs(load_name_table(self.paths[1]), load_name_table(self.paths[1]))
+
+    def test_threads(self):
+        with ThreadPoolExecutor(8) as executor:
+            tables = list(executor.map(load_name_table, self.paths * 8))
+        self.assertEqual(len(set(map(id, tables))), 2)
+
+
+class InstrumentationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = Instrumentation()
+        self.generator = NPCGenerator(small_config(), stats_path=os.path.join(ROOT, "stats.ini"),
+                                      instrumentation=self.metrics, rng=random.Random(7))
+
+    def test_relaxed_counted_on_cache_hits(self):
+        for _ in range(100):
+            self.generator.generate("sw", "fantasy")
+        counters = self.metrics.stats()["counters"]
+        self.assertEqual(self.generator.pool_cache.misses, 2)  # one combination a gender
+        self.assertEqual((counters["relaxed JOBS"], counters["relaxed SPECIES"]), (100, 100))
+
+    def test_relaxed_counted_per_npc(self):
+        self.generator.generate_many(60, "sw", "fantasy")
+        self.generator.generate_roster(40, "sw", "fantasy")
+        counters = self.metrics.stats()["counters"]
+        self.assertEqual((counters["relaxed JOBS"], counters["generated"]), (100, 100))
+
+
+if __name__ == '__main__':
+    unittest.main()
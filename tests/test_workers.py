@@ -0,0 +1,68 @@
+"""
+Check the replies of the generation pool with a stub command context, so that no discord connection is needed.
+Run from the root of the repository: python -m unittest discover tests
+"""
+import asyncio
+import os
+import threading
+import unittest
+
+from workers import GenerationPool, make_executor, worker_rng
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class StubContext:
+    """
+    A command context keeping the messages sent to it
+    """
+
+    def __init__(self):
+        self.messages = list()
+
+    async def send(self, message: str):
+        self.messages.append(message)
+
+
+class GenerationPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = make_executor("thread", 2, os.path.join(ROOT, "npc.ini"), os.path.join(ROOT, "stats.ini"))
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_reply(self):
+        ctx = StubContext()
+        asyncio.run(GenerationPool(self.executor).reply(ctx, str.upper, "pnj"))
+        self.assertEqual(ctx.messages, ["PNJ"])
+
+    def test_reply_busy(self):
+        ctx = StubContext()
+        asyncio.run(GenerationPool(self.executor, max_pending=0).reply(ctx, str.upper, "pnj"))
+        self.assertEqual(ctx.messages, ["Too many requests, try again in a moment."])
+
+    def test_reply_timeout(self):
+        ctx = StubContext()
+        release = threading.Event()
+        try:
+            asyncio.run(GenerationPool(self.executor).reply(ctx, release.wait, timeout=0.05))
+        finally:
+            release.set()  # free the worker thread
+        self.assertEqual(ctx.messages, ["The generation took too long, try again."])
+
+    def test_thread_rngs(self):
+        barrier = threading.Barrier(2)  # both jobs wait for each other, so they run in two threads
+
+        def rng():
+            barrier.wait(1)
+            return worker_rng()
+
+        rngs = [future.result() for future in [self.executor.submit(rng) for _ in range(2)]]
+        self.assertNotIn(None, rngs)
+        self.assertIsNot(rngs[0], rngs[1])
+        self.assertIsNone(worker_rng())
+
+
+if __name__ == '__main__':
+    unittest.main()
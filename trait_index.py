@@ -0,0 +1,246 @@
+from configparser import ConfigParser
+from types import MappingProxyType
+from typing import Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from alias import AliasTable
+from constant_strings import FEMININE_SECTION, METADATA_SECTIONS, WEIGHT_PREFIX
+
+
+class SectionIndex:
+    """
+    Compiled, read-only view of a single section of the config file
+    """
+    __slots__ = (
+        "name", "traits", "tags", "vocabulary", "inverted", "lookup", "columns", "full", "weights", "alias", "items"
+    )
+
+    def __init__(self, name: str, items: Iterable[Tuple[str, str]]):
+        """
+        :param name: the name of the section
+        :param items: the (trait, comma separated tags) pairs of the section, in file order, a "weight=x" tag gives
+        the weight of the trait, 1 by default
+        """
+        items = tuple(items)
+        tags = list()
+        weights = list()
+        vocabulary = dict()  # a dict keeps the order in which the tags are first seen
+        inverted = dict()
+        for position, (trait, raw_tags) in enumerate(items):
+            trait_tags = [tag.strip() for tag in raw_tags.split(',')]
+            weights.append(parse_weight(name, trait, trait_tags))
+            trait_tags = [tag for tag in trait_tags if not tag.startswith(WEIGHT_PREFIX)]
+            tags.append(frozenset(trait_tags))
+            for tag in trait_tags:
+                vocabulary.setdefault(tag, None)
+                inverted.setdefault(tag, set()).add(position)
+        columns = {tag: sum(1 << position for position in pos) for tag, pos in inverted.items()}
+        # the weights are None when all the traits are as likely, so that the uniform draws stay as they are
+        weights = tuple(weights) if len(set(weights)) > 1 else None
+        self._fill(name, items, tuple(tags), tuple(vocabulary), MappingProxyType(columns), weights,
+                   AliasTable(weights) if weights else None,
+                   MappingProxyType({tag: frozenset(pos) for tag, pos in inverted.items()}))
+
+    @classmethod
+    def restore(cls, name: str, items: Sequence[Tuple[str, str]], tags: Sequence[frozenset],
+                vocabulary: Sequence[str], columns: Mapping[str, int], weights: Optional[Sequence[float]] = None,
+                alias: Optional[AliasTable] = None, inverted: Optional[Mapping[str, frozenset]] = None,
+                traits: Optional[Sequence[str]] = None, lookup: Optional[Mapping[str, int]] = None) -> "SectionIndex":
+        """
+        rebuild a compiled section from its tables, without parsing its items again. The tables are kept as given, so
+        they may be read-only views decoded on access, i.e. of a content pack
+        :param name: the name of the section
+        :param items: the (trait, comma separated tags) pairs of the section, in file order
+        :param tags: the tags of each trait, without the weight tags
+        :param vocabulary: every tag used in the section, in the order they are first seen
+        :param columns: the bitset of the traits carrying each tag
+        :param weights: the weight of each trait, None if they are all the same
+        :param alias: the alias table of the weights, None if there are no weights
+        :param inverted: the positions of the traits carrying each tag, computed from the columns if None
+        :param traits: the traits, in file order, taken from items if None
+        :param lookup: the position of each trait, computed from the traits if None
+        :return: the section
+        """
+        section = cls.__new__(cls)
+        section._fill(name, items, tags, vocabulary, columns, weights, alias, inverted, traits, lookup)
+        return section
+
+    def _fill(self, name, items, tags, vocabulary, columns, weights, alias, inverted=None, traits=None, lookup=None):
+        self.name = name
+        self.items = items  # the section as found in the file, to know if it changed
+        self.traits = tuple(trait for trait, _ in items) if traits is None else traits  # the traits, in file order
+        self.tags = tags  # the tags of each trait, aligned with self.traits
+        self.vocabulary = tuple(vocabulary)  # every tag used in this section
+        if inverted is None:
+            inverted = MappingProxyType({tag: frozenset(bit_positions(column)) for tag, column in columns.items()})
+        self.inverted = inverted  # tag -> traits
+        if lookup is None:
+            lookup = MappingProxyType({trait: position for position, trait in enumerate(self.traits)})
+        self.lookup = lookup
+        # bitset engine: each tag is the mask of the traits carrying it, so a whole section is filtered with a few
+        # integer operations
+        self.columns = columns
+        self.full = (1 << len(self.traits)) - 1  # every trait of the section
+        self.weights = weights
+        self.alias = alias  # to draw from the whole section
+
+    def __len__(self):
+        return len(self.traits)
+
+    def relevant(self, tags: Iterable[str]) -> frozenset:
+        """
+        keep only the tags that mean something for this section
+        :param tags: the requested tags
+        :return: the requested tags found in the section vocabulary
+        """
+        return frozenset(tag for tag in tags if tag in self.inverted)
+
+    def query(self, tags: Iterable[str]) -> int:
+        """
+        get the traits carrying all the given tags
+        :param tags: the tags to match, they must belong to the section vocabulary
+        :return: a bitset where the bit n is set if the trait at position n matches
+        """
+        columns = self.columns
+        selected = self.full
+        for tag in tags:
+            selected &= columns.get(tag, 0)
+            if not selected:
+                break
+        return selected
+
+
+class TraitTags(Mapping):
+    """
+    The tags of every trait of an index by trait in upper case, read from the sections on access rather than copied,
+    as before a trait found in two sections gets its tags in the last one
+    """
+    __slots__ = ("sections",)
+
+    def __init__(self, sections: Mapping[str, SectionIndex]):
+        self.sections = tuple(reversed(tuple(sections.values())))
+
+    def __getitem__(self, trait: str) -> frozenset:
+        if isinstance(trait, str):
+            trait = trait.lower()  # the traits are in lower case, as the config parser gives them
+            for section in self.sections:
+                position = section.lookup.get(trait)
+                if position is not None:
+                    return section.tags[position]
+        raise KeyError(trait)
+
+    def __iter__(self):
+        return iter(dict.fromkeys(trait.upper() for section in reversed(self.sections) for trait in section.traits))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class TraitIndex:
+    """
+    Compiled, read-only index of every section of the config file, built once and shared by the generator
+    """
+
+    def __init__(self, sections: Mapping[str, SectionIndex], rebuilt: Iterable[str] = None,
+                 feminine: Mapping[str, str] = None):
+        """
+        :param sections: the compiled sections
+        :param rebuilt: the sections compiled for this index, all of them if None
+        :param feminine: the feminine forms given by the config file, by masculine form
+        """
+        self.sections = MappingProxyType(dict(sections))
+        self.feminine = MappingProxyType(dict(feminine or {}))
+        self.rebuilt = tuple(self.sections if rebuilt is None else rebuilt)
+        self.tags = TraitTags(self.sections)
+        self.traits = MappingProxyType({sec: section.traits for sec, section in self.sections.items()})
+        self.vocabulary = frozenset(tag for section in self.sections.values() for tag in section.vocabulary)
+
+    @classmethod
+    def from_config(cls, config: ConfigParser, previous: "TraitIndex" = None) -> "TraitIndex":
+        """
+        compile the index from a parsed config file
+        :param config: the config parser holding the traits
+        :param previous: an index of an older version of the file, its sections that did not change are reused
+        :return: the compiled index
+        """
+        sections = dict()
+        rebuilt = list()
+        for sec in config:
+            if sec in METADATA_SECTIONS:
+                continue
+            items = tuple(config[sec].items())
+            if previous is not None and sec in previous and tuple(previous[sec].items) == items:
+                sections[sec] = previous[sec]
+            else:
+                sections[sec] = SectionIndex(sec, items)
+                rebuilt.append(sec)
+        feminine = dict(config[FEMININE_SECTION]) if config.has_section(FEMININE_SECTION) else None
+        return cls(sections, rebuilt, feminine)
+
+    def __getitem__(self, section: str) -> SectionIndex:
+        return self.sections[section]
+
+    def __iter__(self):
+        return iter(self.sections)
+
+    def __contains__(self, section):
+        return section in self.sections
+
+
+def parse_weight(section: str, trait: str, tags: List[str]) -> float:
+    """
+    find the weight of a trait among its tags
+    :param section: the name of the section, for the error message
+    :param trait: the trait, for the error message
+    :param tags: the tags of the trait
+    :return: the weight, 1 if there is no weight tag
+    """
+    weight = 1.
+    for tag in tags:
+        if tag.startswith(WEIGHT_PREFIX):
+            try:
+                weight = float(tag[len(WEIGHT_PREFIX):])
+            except ValueError:
+                weight = 0.
+            if not weight > 0:
+                raise ValueError(f"Invalid weight for {trait} in {section}: {tag}, it must be a positive number")
+    return weight
+
+
+def popcount(bits: int) -> int:
+    """
+    count the set bits of a bitset
+    :param bits: the bitset
+    :return: the number of set bits
+    """
+    return bin(bits).count("1")
+
+
+if hasattr(int, "bit_count"):  # python 3.10+ counts the bits without building a string
+    popcount = int.bit_count  # noqa: F811
+
+
+def nth_bit(bits: int, rank: int) -> int:
+    """
+    find the position of the rank-th set bit without listing all of them, by bisecting on the popcount of the low bits
+    :param bits: the bitset
+    :param rank: the rank of the wanted bit, starting at 0, it must be lower than the popcount of bits
+    :return: the position of the bit
+    """
+    low, high = 0, bits.bit_length()  # the answer is in [low, high)
+    while high - low > 1:
+        middle = (low + high) >> 1
+        if popcount(bits & ((1 << middle) - 1)) > rank:
+            high = middle
+        else:
+            low = middle
+    return low
+
+
+def bit_positions(bits: int) -> Tuple[int, ...]:
+    """
+    list the positions of the set bits of a bitset
+    :param bits: the bitset
+    :return: the sorted positions
+    """
+    binary = bin(bits)[:1:-1]  # lowest bit first
+    return tuple(position for position, bit in enumerate(binary) if bit == "1")
@@ -0,0 +1,368 @@
+import asyncio
+import random
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from configparser import ConfigParser
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from manager import NPCGenerator
+from constant_strings import *
+from content_pack import load_pack
+from instrumentation import Instrumentation, capture, format_stats
+from random_streams import spawn, stream_seed
+from reloader import ContentWatcher, watch_generator
+
+_generator: Optional[NPCGenerator] = None  # the generator of this process, set by init_worker
+_watcher: Optional[ContentWatcher] = None  # reloads the files of the generator when they change
+_thread_rng = threading.local()  # the random generator of each thread of a thread pool, set by init_thread
+
+
+def init_worker(npc_path: str = "npc.ini", stats_path: str = "stats.ini", pack_path: Optional[str] = None,
+                instrument: bool = False):
+    """
+    load the generator of the current process, run once in every worker process
+    :param npc_path: the path to the traits config file
+    :param stats_path: the path to the stats file
+    :param pack_path: the path to the compiled content pack, compiled again if the files changed, the config files
+    are parsed if None
+    :param instrument: collect the retries and the stage timings of the generator, see perf_report
+    """
+    global _generator, _watcher
+    instrumentation = Instrumentation() if instrument else None
+    if pack_path is None:
+        npc = ConfigParser()
+        npc.read(npc_path, "utf8")
+        _generator = NPCGenerator(npc, stats_path=stats_path, instrumentation=instrumentation)
+    else:
+        _generator = NPCGenerator.from_pack(load_pack(pack_path, npc_path, stats_path), stats_path=stats_path,
+                                            instrumentation=instrumentation)
+    _watcher = ContentWatcher()
+    watch_generator(_watcher, _generator, npc_path)
+
+
+def init_thread(rngs: List[random.Random]):
+    """
+    give the current thread its own random generator, run once in every thread of a thread pool, so that the threads
+    sharing the generator of the process do not share its random generator
+    :param rngs: the random generators not taken yet by a thread of the pool
+    """
+    _thread_rng.rng = rngs.pop()
+
+
+def worker_rng() -> Optional[random.Random]:
+    """
+    :return: the random generator of the current thread, None in a worker process which has the generator to itself
+    """
+    return getattr(_thread_rng, "rng", None)
+
+
+def describe_npc(*tags) -> str:
+    """
+    generate a NPC and describe it in a sentence
+    :param tags: the list of tags to rule the NPC to create
+    :return: the description of the NPC
+    """
+    _watcher.check()  # each worker process has its own generator, so each one looks for changes
+    return _generator.renderer.describe(_generator.generate(*tags, rng=worker_rng()))
+
+
+def describe_npcs(n: int, *tags) -> List[str]:
+    """
+    generate a crowd of NPCs and describe each of them in a sentence
+    :param n: the number of NPCs to create
+    :param tags: the list of tags to rule the NPCs to create
+    :return: the descriptions of the NPCs
+    """
+    _watcher.check(force=True)  # the buffers are refilled with this, they must not get NPCs of an old content
+    describe = _generator.renderer.describe
+    return [describe(traits) for traits in _generator.generate_many(n, *tags, rng=worker_rng())]
+
+
+def generate_npcs(n: int, *tags, seed: Optional[int] = None) -> List[dict]:
+    """
+    generate a crowd of NPCs with the generator of this worker
+    :param n: the number of NPCs to create
+    :param tags: the list of tags to rule the NPCs to create
+    :param seed: the seed of the random stream of this crowd, the random generator of the worker is used if None
+    :return: the NPCs, as given by NPCGenerator.generate_many
+    """
+    _watcher.check()
+    return _generator.generate_many(n, *tags, rng=worker_rng() if seed is None else random.Random(seed))
+
+
+def generate_many(executor: Executor, n: int, *tags, chunk_size: int = 2048,
+                  seed: Optional[int] = None) -> List[dict]:
+    """
+    generate a crowd of NPCs split in chunks across the workers of a pool. With a process pool started with a
+    pack_path, every worker maps the same content pack instead of parsing its own copy of the config files. Each
+    worker draws its own names, so a name registry does not span the workers. Each chunk is drawn from its own
+    random stream, derived from the seed and the number of the chunk, so the threads do not share the global random
+    generator and a seeded crowd is the same whatever the number of workers and the order they run the chunks in
+    :param executor: the pool, see make_executor
+    :param n: the number of NPCs to create
+    :param tags: the list of tags to rule the NPCs to create
+    :param chunk_size: the number of NPCs generated by each job
+    :param seed: the seed of the crowd, a random one if None
+    :return: the NPCs, as given by NPCGenerator.generate_many
+    """
+    seed = random.getrandbits(128) if seed is None else seed
+    futures = [
+        executor.submit(generate_npcs, min(chunk_size, n - start), *tags, seed=stream_seed(seed, chunk))
+        for chunk, start in enumerate(range(0, n, chunk_size))
+    ]
+    return [npc for future in futures for npc in future.result()]
+
+
+def perf_report() -> str:
+    """
+    :return: the counters of the generator of this worker and of its watcher, one per line. With a process pool,
+    each worker has its own counters and the report is the one of the worker running the job
+    """
+    return format_stats({"generator": _generator.stats(), "watcher": _watcher.stats()})
+
+
+def profile_npc(profile: bool, memory: bool, *tags) -> str:
+    """
+    generate a NPC under the profiler and/or the memory tracer
+    :param profile: profile the generation with cProfile
+    :param memory: trace the memory allocated by the generation with tracemalloc
+    :param tags: the list of tags to rule the NPC to create
+    :return: the description of the NPC, then the report of the generation
+    """
+    description, report = capture(describe_npc, *tags, profile=profile, memory=memory)
+    return f"{description}\n{report}"
+
+
+def tag_list() -> str:
+    """
+    :return: all the tags of the generator, separated by spaces
+    """
+    return " ".join(_generator.get_tag_list())
+
+
+def make_executor(kind: str = "thread", workers: int = 2, npc_path: str = "npc.ini", stats_path: str = "stats.ini",
+                  pack_path: Optional[str] = None, instrument: bool = False) -> Executor:
+    """
+    create the pool running the generations
+    :param kind: "thread" to share one generator between threads, "process" to give each worker process its own
+    :param workers: the number of threads or processes
+    :param npc_path: the path to the traits config file
+    :param stats_path: the path to the stats file
+    :param pack_path: the path to the compiled content pack, the config files are parsed if None
+    :param instrument: collect the retries and the stage timings of the generators, see perf_report
+    :return: the executor
+    """
+    if kind == "process":
+        if pack_path is not None:
+            load_pack(pack_path, npc_path, stats_path).close()  # compiled once here rather than by every worker
+        return ProcessPoolExecutor(workers, initializer=init_worker, initargs=(npc_path, stats_path, pack_path, instrument))
+    elif kind == "thread":
+        init_worker(npc_path, stats_path, pack_path, instrument)  # the threads share the generator of this process
+        return ThreadPoolExecutor(workers, thread_name_prefix="npc", initializer=init_thread,
+                                  initargs=(spawn(random.getrandbits(128), workers),))
+    raise ValueError(f"Unknown pool kind {kind}, expected thread or process")
+
+
+class PoolBusy(Exception):
+    """
+    Raised when too many generations are already waiting for the pool
+    """
+
+
+class GenerationPool:
+    """
+    Run the generations off the event loop, with a bounded number of pending jobs and a timeout for each of them
+    """
+
+    def __init__(self, executor: Executor, max_pending: int = 32, timeout: float = 5.):
+        """
+        :param executor: the thread or process pool doing the work
+        :param max_pending: the number of jobs running or waiting beyond which new ones are refused
+        :param timeout: the number of seconds after which a job is given up
+        """
+        self.executor = executor
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+
+    async def run(self, func: Callable, *args, timeout: float = None):
+        """
+        run a function in the pool without blocking the event loop
+        :param func: the function to run, it must be picklable for a process pool
+        :param args: its arguments
+        :param timeout: the number of seconds to wait for this job, the pool timeout if None
+        :return: what the function returns
+        :raise PoolBusy: if the pool already has max_pending jobs
+        :raise asyncio.TimeoutError: if the job took too long
+        """
+        if self.pending >= self.max_pending:
+            raise PoolBusy()
+        self.pending += 1
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+            return await asyncio.wait_for(future, self.timeout if timeout is None else timeout)
+        finally:
+            self.pending -= 1
+
+    async def reply(self, ctx, func: Callable, *args, timeout: float = None):
+        """
+        run a function in the pool and send its result, or the reason why there is none, to a command context
+        :param ctx: the command context, anything with an async send method
+        :param func: the function to run, it must return the message to send
+        :param args: its arguments
+        :param timeout: the number of seconds to wait for this job, the pool timeout if None
+        """
+        try:
+            message = await self.run(func, *args, timeout=timeout)
+        except PoolBusy:
+            message = "Too many requests, try again in a moment."
+        except asyncio.TimeoutError:
+            message = "The generation took too long, try again."
+        await ctx.send(message)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+class NPCBuffer:
+    """
+    Keep descriptions of NPCs generated in advance for the most used tag combinations, so that a command is answered
+    by taking one from a buffer. A background task refills a buffer whenever it runs low
+    """
+
+    def __init__(self, pool: GenerationPool, size: int = 64, low_water: int = 16, max_tag_sets: int = 32,
+                 warm: Iterable[Tuple[str, ...]] = ((), (SW_TAG,), (OGL_TAG,), (WOM,), (MAN,)),
+                 content_paths: Iterable[str] = ("npc.ini",)):
+        """
+        :param pool: the pool generating the NPCs
+        :param size: the number of descriptions kept for each tag combination
+        :param low_water: the number of descriptions below which a buffer is refilled
+        :param max_tag_sets: the number of tag combinations kept, the least recently used is dropped beyond that, so
+        at most max_tag_sets * size descriptions are kept in memory
+        :param warm: the tag combinations to fill when the buffer starts
+        :param content_paths: the files the NPCs are generated from, the buffers are emptied when one of them changes
+        """
+        self.pool = pool
+        self.size = size
+        self.low_water = low_water
+        self.max_tag_sets = max_tag_sets
+        self.warm = [self.key(tags) for tags in warm]
+        self.buffers: Dict[Tuple[str, ...], Deque[str]] = OrderedDict()  # least recently used first
+        self.refilling = dict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushes = 0
+        self.version = 0  # changed by clear, the descriptions of the refills started before are dropped
+        self.watcher = ContentWatcher()
+        for path in content_paths:
+            self.watcher.watch(path, lambda path: self.clear())
+
+    @staticmethod
+    def key(tags: Iterable[str]) -> Tuple[str, ...]:
+        """
+        normalize a tag combination, the order and the repetitions of the tags do not matter
+        :param tags: the requested tags
+        :return: the sorted distinct tags
+        """
+        return tuple(sorted(set(tag for tag in tags if tag)))
+
+    def start(self):
+        """
+        fill the buffers of the warm tag combinations in the background, it must be called from the event loop
+        """
+        for key in self.warm:
+            self._track(key)
+            self._schedule(key)
+
+    async def get(self, *tags) -> str:
+        """
+        get the description of a NPC, from its buffer if possible or generated on the spot else
+        :param tags: the list of tags to rule the NPC to create
+        :return: the description of the NPC
+        """
+        self.watcher.check()
+        key = self.key(tags)
+        buffer = self._track(key)
+        if buffer:
+            self.hits += 1
+            description = buffer.popleft()
+        else:
+            self.misses += 1
+            description = None
+        if len(buffer) < self.low_water:
+            self._schedule(key)
+        if description is None:
+            description = await self.pool.run(describe_npc, *key)
+        return description
+
+    async def reply(self, ctx, *tags):
+        """
+        send the description of a NPC to a command context
+        :param ctx: the command context, anything with an async send method
+        :param tags: the list of tags to rule the NPC to create
+        """
+        try:
+            message = await self.get(*tags)
+        except PoolBusy:
+            message = "Too many requests, try again in a moment."
+        except asyncio.TimeoutError:
+            message = "The generation took too long, try again."
+        await ctx.send(message)
+
+    def stats(self) -> dict:
+        """
+        :return: the counters of the buffer
+        """
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / requests if requests else 0.,
+            "evictions": self.evictions, "flushes": self.flushes, "tag_sets": len(self.buffers),
+            "buffered": sum(len(buffer) for buffer in self.buffers.values())
+        }
+
+    def clear(self):
+        """
+        drop every description kept, i.e. when the content changed, the buffers are refilled on their next use
+        """
+        self.version += 1
+        self.flushes += 1
+        for buffer in self.buffers.values():
+            buffer.clear()
+
+    def _track(self, key: Tuple[str, ...]) -> Deque[str]:
+        """
+        get the buffer of a tag combination, creating it and dropping the least recently used ones if needed
+        :param key: the normalized tags
+        :return: the buffer
+        """
+        if key in self.buffers:
+            self.buffers.move_to_end(key)
+            return self.buffers[key]
+        self.buffers[key] = deque()
+        while len(self.buffers) > self.max_tag_sets:
+            self.buffers.popitem(last=False)
+            self.evictions += 1
+        return self.buffers[key]
+
+    def _schedule(self, key: Tuple[str, ...]):
+        if key not in self.refilling:
+            self.refilling[key] = asyncio.get_running_loop().create_task(self._refill(key))
+
+    async def _refill(self, key: Tuple[str, ...]):
+        """
+        fill a buffer up to its size, the descriptions are generated together in the pool
+        :param key: the normalized tags
+        """
+        try:
+            while key in self.buffers and len(self.buffers[key]) < self.size:
+                version = self.version
+                descriptions = await self.pool.run(describe_npcs, self.size - len(self.buffers[key]), *key)
+                # it may have been dropped, or the content may have changed, while generating
+                if key in self.buffers and version == self.version:
+                    self.buffers[key].extend(descriptions)
+        except (PoolBusy, asyncio.TimeoutError):
+            pass  # the pool is overloaded, the buffer will be refilled on its next use
+        finally:
+            del self.refilling[key]